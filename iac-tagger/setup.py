@@ -7,7 +7,7 @@ setup(
     package_dir={"": "src"},
     install_requires=[
         "pyyaml>=6.0.1",
-        "python-hcl2>=4.3.2",
+        "python-hcl2>=4.3.2,<5",
         "gitpython>=3.1.31",
     ],
     entry_points={
@@ -0,0 +1,207 @@
+"""
+Benchmark harness for iac-tagger.
+
+Generates a synthetic IaC repository (Terraform files with plain and
+merge() tags, multi-document Kubernetes manifests and a git history),
+times the main operations against it and prints a JSON report, so runs
+can be compared between releases:
+
+    python -m iac_tagger.bench --tf-files 200 --resources 50 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from iac_tagger import __version__
+from iac_tagger.cache import ResourceCache
+from iac_tagger.main import IaCTagger
+
+_GIT_ENV = {
+    "GIT_AUTHOR_NAME": "iac-tagger-bench",
+    "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "iac-tagger-bench",
+    "GIT_COMMITTER_EMAIL": "bench@example.com",
+}
+
+
+def terraform_resource(index: int, rng: random.Random) -> str:
+    name = f"r{index}"
+    if rng.random() < 0.5:
+        tags = f'''  tags = {{
+    Name        = "{name}"
+    Environment = "bench"
+  }}'''
+    else:
+        tags = f'''  tags = merge(local.common_tags, {{
+    Name = "{name}"
+  }})'''
+    return f'''resource "aws_s3_bucket" "{name}" {{
+  bucket = "bench-{name}-{rng.randrange(10 ** 6)}"
+  acl    = "private"
+
+  versioning {{
+    enabled = true
+  }}
+
+{tags}
+}}
+'''
+
+
+def kubernetes_document(index: int, rng: random.Random) -> str:
+    data = "".join(f"  key{i}: value-{rng.randrange(10 ** 6)}\n" for i in range(10))
+    return f'''apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: config-{index}
+  namespace: bench
+  labels:
+    app: bench
+data:
+{data}'''
+
+
+def git(repo: Path, *args: str) -> None:
+    subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True,
+                   env={**os.environ, **_GIT_ENV})
+
+
+def generate_repo(root: Path, tf_files: int, resources: int, k8s_files: int,
+                  documents: int, commits: int, seed: int = 0) -> List[Path]:
+    """Write a synthetic IaC repository under root and return its IaC files"""
+    rng = random.Random(seed)
+    files = []
+    for i in range(tf_files):
+        path = root / "terraform" / f"module{i % 10}" / f"main{i}.tf"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(terraform_resource(r, rng) for r in range(resources)))
+        files.append(path)
+    for i in range(k8s_files):
+        path = root / "k8s" / f"app{i % 10}" / f"manifest{i}.yaml"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("---\n".join(kubernetes_document(d, rng) for d in range(documents)))
+        files.append(path)
+
+    git(root, "init", "-q")
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "Initial commit")
+    for i in range(1, commits):
+        path = rng.choice(files)
+        with open(path, "a") as f:
+            f.write(f"# change {i}\n")
+        git(root, "commit", "-q", "-a", "-m", f"Change {i}")
+    return files
+
+
+def timed(results: Dict[str, dict], name: str, calls: int, func: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": round(seconds, 6),
+        "calls": calls,
+        "per_call": round(seconds / calls, 9) if calls else None,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="iac-tagger-bench-"))
+    repo = workdir / "repo"
+    repo.mkdir(parents=True, exist_ok=True)
+    try:
+        files = generate_repo(repo, args.tf_files, args.resources, args.k8s_files,
+                              args.documents, args.commits, args.seed)
+        results: Dict[str, dict] = {}
+        tagger = IaCTagger(yaml_backend=args.yaml_backend)
+
+        parsed: Dict[Path, dict] = {}
+        timed(results, "get_resources", len(files),
+              lambda: parsed.update({path: tagger._get_parser(path).get_resources(path) for path in files}))
+
+        resources = [resource for file_resources in parsed.values() for resource in file_resources.values()]
+        hash_parser = tagger.get_parser_for_extension('.tf')
+        timed(results, "generate_resource_hash", len(resources),
+              lambda: [hash_parser.generate_resource_hash(resource) for resource in resources])
+
+        # Per-resource API on a scratch copy of one Terraform file, the pre-batch cost model
+        sample = files[0]
+        scratch = workdir / "scratch.tf"
+        shutil.copy(sample, scratch)
+        resource_ids = list(parsed[sample])
+        timed(results, "add_tracking_tag", len(resource_ids),
+              lambda: [tagger._get_parser(scratch).add_tracking_tag(scratch, rid) for rid in resource_ids])
+        shutil.copy(sample, scratch)
+        timed(results, "add_tracking_tags", 1,
+              lambda: tagger._get_parser(scratch).add_tracking_tags(scratch))
+
+        # cold: every file is parsed and tagged; tagged: the freshly tagged
+        # files are parsed once more and found current; warm: nothing changed,
+        # so every file is served from the resource cache
+        cache_dir = workdir / "cache"
+        for label in ("cold", "tagged", "warm"):
+            cached = IaCTagger(resource_cache=ResourceCache(str(cache_dir)), yaml_backend=args.yaml_backend)
+            timed(results, f"process_directory_{label}", len(files),
+                  lambda: cached.process_directory(str(repo), recursive=True, jobs=args.jobs))
+            cached.close()
+        tagger.close()
+
+        return {
+            "tool_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "tf_files": args.tf_files,
+                "resources": args.resources,
+                "k8s_files": args.k8s_files,
+                "documents": args.documents,
+                "commits": args.commits,
+                "jobs": args.jobs,
+                "yaml_backend": tagger.get_parser_for_extension('.yaml').yaml.name,
+                "seed": args.seed,
+            },
+            "results": results,
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m iac_tagger.bench",
+        description="Benchmark iac-tagger on a synthetic repository and report JSON timings"
+    )
+    parser.add_argument("--tf-files", type=int, default=50, help="Number of Terraform files")
+    parser.add_argument("--resources", type=int, default=50, help="Resources per Terraform file")
+    parser.add_argument("--k8s-files", type=int, default=20, help="Number of Kubernetes manifests")
+    parser.add_argument("--documents", type=int, default=50, help="Documents per Kubernetes manifest")
+    parser.add_argument("--commits", type=int, default=100, help="Commits in the generated git history")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes for process_directory")
+    parser.add_argument("--yaml-backend", default="auto", help="YAML backend for Kubernetes manifests")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated content")
+    parser.add_argument("--workdir", help="Where to generate the repository (default: a temp directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated repository")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.tf_files < 1:
+        parser.error("--tf-files must be at least 1")
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from iac_tagger import __version__
+
+
+class ResourceCache:
+    """
+    On-disk cache of resource indexes, keyed by file content digest.
+
+    Each entry maps a parser, the tool version and the exact file content to
+    the resources found in it ({resource_id: {"hash", "tag", "span"}}), so an
+    unchanged file never has to be parsed or hashed again. Hits are noted in
+    memory and their last use recorded in one transaction by flush(), so
+    reads never wait for SQLite's write lock. When the cache is closed, the
+    least recently used entries are evicted until it holds at most
+    max_entries files and max_bytes of indexes.
+    An instance may be shared by threads; its connection is used under a lock.
+
+    A read_only cache (as used by --check) never creates, writes or evicts
+    anything: it only reads an existing database, and misses when there is
+    none. A cache that cannot be opened or used (e.g. in a read-only
+    checkout) warns once and from then on behaves as if there were none.
+    """
+    DEFAULT_DIR = ".iac_tagger_cache"
+
+    def __init__(self, cache_dir: str = DEFAULT_DIR, max_entries: int = 50000,
+                 max_bytes: int = 256 * 1024 * 1024, read_only: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.disabled = False
+        self._conn: Optional[sqlite3.Connection] = None
+        # Keys read since the last flush
+        self._touched: Set[str] = set()
+        self._lock = threading.RLock()
+
+    @property
+    def db_path(self) -> Path:
+        return self.cache_dir / "resources.sqlite"
+
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        """The database connection, or None when there is no usable cache"""
+        with self._lock:
+            if self._conn is None and not self.disabled:
+                try:
+                    self._conn = self._open()
+                except (OSError, sqlite3.Error) as e:
+                    self._disable(e)
+            return self._conn
+
+    def usable(self) -> bool:
+        """Open the cache now, returning False if it had to be disabled"""
+        return self.conn is not None or not self.disabled
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        if self.read_only:
+            if not self.db_path.exists():
+                return None
+            uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            return sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        ignore_file = self.cache_dir / ".gitignore"
+        if not ignore_file.exists():
+            ignore_file.write_text("# Created by iac-tagger\n*\n")
+        conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS resources ("
+                " key TEXT PRIMARY KEY, resources TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS resources_last_used ON resources (last_used)")
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _disable(self, error: Exception) -> None:
+        """Carry on without the cache, after saying why once"""
+        if not self.disabled:
+            warnings.warn(f"Resource cache in {self.cache_dir} is unusable ({error}), continuing without it")
+        self.disabled = True
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    @staticmethod
+    def key(namespace: str, content: str) -> str:
+        """Cache key for content as indexed by the given parser"""
+        digest = hashlib.sha256(f"{namespace}\0{__version__}\0".encode())
+        digest.update(content.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, dict]]:
+        with self._lock:
+            conn = self.conn
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT resources FROM resources WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+            if row is None:
+                return None
+            if not self.read_only:
+                self._touched.add(key)
+        return json.loads(row[0])
+
+    def put(self, key: str, resources: Dict[str, dict]) -> None:
+        if self.read_only:
+            return
+        value = json.dumps(resources, separators=(',', ':'))
+        with self._lock:
+            conn = self.conn
+            if conn is None:
+                return
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO resources (key, resources, last_used) VALUES (?, ?, ?)",
+                        (key, value, time.time()),
+                    )
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def flush(self) -> None:
+        """Record the last use of the entries read since the previous flush"""
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            if not touched or self.read_only or self.disabled:
+                return
+            conn = self.conn
+            if conn is None:
+                return
+            now = time.time()
+            try:
+                with conn:
+                    conn.executemany("UPDATE resources SET last_used = ? WHERE key = ?",
+                                          [(now, key) for key in sorted(touched)])
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def evict(self) -> None:
+        """Drop the least recently used entries beyond max_entries or max_bytes"""
+        with self._lock:
+            conn = self.conn
+            if conn is None or self.read_only:
+                return
+            try:
+                # Newest first; keep entries while both budgets last
+                rows = conn.execute(
+                    "SELECT key, LENGTH(resources) FROM resources ORDER BY last_used DESC, rowid DESC").fetchall()
+                total = 0
+                stale = []
+                for position, (key, size) in enumerate(rows):
+                    total += size
+                    if position >= self.max_entries or total > self.max_bytes:
+                        stale.append((key,))
+                if stale:
+                    with conn:
+                        conn.executemany("DELETE FROM resources WHERE key = ?", stale)
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            # Worker processes may have filled the cache without this instance
+            # ever opening it, so evict whenever the database exists
+            if not self.read_only and not self.disabled and (self._conn is not None or self.db_path.exists()):
+                self.evict()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class MemoryCache:
+    """
+    In-memory layer of resource indexes over an optional ResourceCache.
+
+    Meant for long-running processes such as the watch daemon: indexes of
+    every file seen stay in memory, so re-tagging an edited file parses only
+    that file. Same interface as ResourceCache.
+    """
+
+    def __init__(self, backing: Optional[ResourceCache] = None, max_entries: int = 10000):
+        self.backing = backing
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache_dir(self) -> Optional[Path]:
+        return self.backing.cache_dir if self.backing else None
+
+    @property
+    def read_only(self) -> bool:
+        return self.backing.read_only if self.backing else False
+
+    key = staticmethod(ResourceCache.key)
+
+    def usable(self) -> bool:
+        return self.backing.usable() if self.backing else False
+
+    def flush(self) -> None:
+        if self.backing is not None:
+            self.backing.flush()
+
+    def get(self, key: str) -> Optional[Dict[str, dict]]:
+        with self._lock:
+            resources = self._entries.get(key)
+            if resources is not None:
+                self._entries.move_to_end(key)
+                return resources
+        if self.backing is None:
+            return None
+        resources = self.backing.get(key)
+        if resources is not None:
+            self._remember(key, resources)
+        return resources
+
+    def put(self, key: str, resources: Dict[str, dict]) -> None:
+        self._remember(key, resources)
+        if self.backing is not None:
+            self.backing.put(key, resources)
+
+    def _remember(self, key: str, resources: Dict[str, dict]) -> None:
+        with self._lock:
+            self._entries[key] = resources
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def close(self) -> None:
+        if self.backing is not None:
+            self.backing.close()
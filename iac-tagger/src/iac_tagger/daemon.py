@@ -0,0 +1,184 @@
+"""
+Long-running tagging daemon and its client.
+
+The daemon keeps one IaCTagger alive, with parsers loaded once and every
+resource index held in memory, re-tags files as soon as a watcher reports
+them changed, and answers requests from hooks over a Unix socket. Requests
+and responses are single JSON lines:
+
+    {"paths": ["/abs/main.tf", ...], "check": false}
+    {"results": {"/abs/main.tf": true, ...}}
+
+Results are what process_file (or check_file with "check") returns, or an
+"Error: ..." string.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from iac_tagger.main import IaCTagger
+
+SOCKET_NAME = "daemon.sock"
+
+
+class TagDaemon:
+    def __init__(self, tagger: "IaCTagger", directory: str, recursive: bool = True,
+                 socket_path: Optional[str] = None, polling: bool = False,
+                 on_result: Optional[Callable[[str, Any], None]] = None):
+        self.tagger = tagger
+        self.directory = directory
+        self.recursive = recursive
+        self.socket_path = socket_path
+        self.polling = polling
+        self.on_result = on_result
+        # Parsers, the commit resolver and the cache are not safe for
+        # concurrent use, so requests and watch events take turns
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server: Optional[socketserver.BaseServer] = None
+        # (mtime, size) of the files this daemon wrote, so the change events
+        # of its own writes are not mistaken for edits
+        self._written: Dict[str, Tuple[int, int]] = {}
+        self.watcher = None
+
+    def handle_paths(self, paths: Iterable[str], check: bool = False) -> Dict[str, Any]:
+        """Tag (or check) paths right away, returning {path: result}"""
+        with self._lock:
+            results = {}
+            for path in paths:
+                results[path] = self._process(path, check)
+                if results[path] is True:
+                    self._written[os.path.realpath(path)] = _signature(path)
+            self.tagger.flush_writes()
+            if self.tagger.resource_cache is not None:
+                self.tagger.resource_cache.flush()
+        return results
+
+    def _handle_changes(self, paths: Iterable[str]) -> None:
+        edited = []
+        for path in paths:
+            written = self._written.pop(os.path.realpath(path), None)
+            if written is None or written != _signature(path):
+                edited.append(path)
+        results = self.handle_paths(edited)
+        if self.on_result is not None:
+            for path, result in results.items():
+                self.on_result(path, result)
+
+    def _process(self, path: str, check: bool) -> Any:
+        try:
+            return self.tagger.check_file(path) if check else self.tagger.process_file(path)
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    def start(self) -> None:
+        """Warm the in-memory state with one full pass, then start watching and listening"""
+        # Only the serving side needs the watchers; hook clients just send requests
+        from iac_tagger.watcher import create_watcher
+
+        self.watcher = create_watcher(self.directory, self.tagger.get_supported_extensions(),
+                                      self.recursive, self.polling)
+        self._handle_changes(str(path) for path in self.tagger.iter_files(self.directory, self.recursive))
+        if self.socket_path:
+            self._server = _bind(self.socket_path, self)
+            threading.Thread(target=self._server.serve_forever, name="iac-tagger-socket", daemon=True).start()
+
+    def serve_forever(self) -> None:
+        if self.watcher is None:
+            self.start()
+        while not self._stopped.is_set():
+            changed = self.watcher.wait(timeout=0.5)
+            if changed:
+                self._handle_changes(str(path) for path in changed)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def close(self) -> None:
+        self.stop()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            results = self.server.tag_daemon.handle_paths(request["paths"], bool(request.get("check")))
+            response = {"results": results}
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"error": f"Bad request: {e}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, tag_daemon: TagDaemon):
+        self.tag_daemon = tag_daemon
+        super().__init__(socket_path, _RequestHandler)
+
+
+def _bind(socket_path: str, tag_daemon: TagDaemon) -> _Server:
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if os.path.exists(socket_path):
+        # A live daemon answers; a stale socket file from a crash is replaced
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+        else:
+            raise RuntimeError(f"Another daemon is already listening on {socket_path}")
+    return _Server(socket_path, tag_daemon)
+
+
+def request(socket_path: str, paths: List[str], check: bool = False, timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    Hand paths to a running daemon and wait for its results.
+
+    Paths are sent absolute, since the daemon may run in another directory.
+    Raises OSError (e.g. FileNotFoundError, ConnectionRefusedError) when no
+    daemon is listening, so callers can fall back to tagging in process.
+
+    Returns:
+        dict: {path: result} keyed by the paths as given.
+    """
+    absolute = [os.path.abspath(path) for path in paths]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps({"paths": absolute, "check": check}).encode() + b"\n")
+        with client.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError(f"Daemon on {socket_path} closed the connection without answering")
+    response = json.loads(line)
+    if "error" in response:
+        raise ValueError(response["error"])
+    return {path: response["results"][full_path] for path, full_path in zip(paths, absolute)}
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def default_socket_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, SOCKET_NAME)
@@ -0,0 +1,337 @@
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from iac_tagger.stats import run_stats
+
+if TYPE_CHECKING:
+    import git
+
+# Commit of a line as reported by blame: (committer time, full hash)
+BlameLine = Tuple[int, str]
+
+# Header line of a `git blame --porcelain` entry: <hash> <original line> <final line> [<lines in group>]
+_BLAME_HEADER = re.compile(rb'([0-9a-f]{40,64}) \d+ \d+')
+
+
+class _RepoHistory:
+    """Last-commit map of one working tree, filled lazily from one walk of its history"""
+
+    def __init__(self, repo: "git.Repo"):
+        self.repo = repo
+        self.root = os.path.realpath(repo.working_tree_dir)
+        self.head: Optional[str] = None
+        self.commits: Dict[str, str] = {}
+        self._walk: Optional[Iterator[Tuple[str, str]]] = None
+        self._procs: List[subprocess.Popen] = []
+
+    def current_head(self) -> Optional[str]:
+        from git.refs.symbolic import SymbolicReference
+
+        # Resolves HEAD by reading refs from disk, so checking it costs no fork
+        try:
+            return SymbolicReference.dereference_recursive(self.repo, 'HEAD')
+        except (ValueError, OSError):
+            return None
+
+    def reset(self, head: Optional[str]) -> None:
+        self.close()
+        self.head = head
+        self.commits = {}
+        self._walk = self._log() if head else None
+
+    def close(self) -> None:
+        for proc in self._procs:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+        self._procs = []
+        self._walk = None
+
+    def _log(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (path, commit) for the last commit of every path, newest first,
+        as `git log -n 1 -- <path>` finds it.
+
+        That lookup simplifies history: a merge is followed only into its
+        first parent with the same content as the merge, so changes the merge
+        discarded (e.g. with `-s ours`) never count, and the merge is itself
+        the commit of paths that differ from all of its parents. The walk
+        replays this for all paths at once, passing each path from commit to
+        parent until a commit changes it. Paths not sent elsewhere by a merge
+        go down the first parents of HEAD, so only the paths merges send into
+        side branches are tracked one by one.
+        """
+        # Paths of each merge that differ from all its parents, in the same order
+        combined = self._log_stream('--merges', '-c')
+        trunk = self.head
+        # Paths resolved or sent into a side branch, no longer going down the trunk
+        off_trunk: Set[str] = set()
+        # Paths sent into side branches, by the commit they wait at
+        routes: Dict[str, Set[str]] = {}
+        for commit, parents, changed in self._log_stream('--diff-merges=first-parent'):
+            on_trunk = commit == trunk
+            if on_trunk:
+                trunk = parents[0] if parents else None
+            waiting = routes.pop(commit, set())
+            if not on_trunk and not waiting:
+                continue
+            changed = set(changed)
+            arrived = waiting & changed
+            if on_trunk:
+                arrived.update(changed - off_trunk)
+                off_trunk.update(arrived)
+            if arrived and len(parents) > 1:
+                differing: Set[str] = set()
+                for merge, _, paths in combined:
+                    if merge == commit:
+                        differing = set(paths)
+                        break
+                for path in sorted(arrived - differing):
+                    routes.setdefault(self._same_parent(commit, parents[1:], path), set()).add(path)
+                arrived &= differing
+            for path in sorted(arrived):
+                yield path, commit
+            if parents and waiting - changed:
+                routes.setdefault(parents[0], set()).update(waiting - changed)
+        self.close()
+
+    def _same_parent(self, merge: str, parents: List[str], path: str) -> str:
+        """First of parents (of merge, besides the first) where path has the content it has in merge"""
+        for parent in parents[:-1]:
+            # Octopus merges only; two-parent merges have a single candidate
+            if path not in self._git_paths('diff', '--name-only', '--no-renames', '-z', parent, merge, '--'):
+                return parent
+        return parents[-1]
+
+    def _log_stream(self, *args: str) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """Yield (commit, parents, changed paths) from `git log` in date order, children before parents"""
+        run_stats.count("subprocesses")
+        proc = subprocess.Popen(
+            ['git', 'log', '--date-order', '--name-only', '--no-renames', '-z', '--format=%x01%H %P', *args],
+            cwd=self.root,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._procs.append(proc)
+        header = None
+        paths: List[str] = []
+        buffer = b''
+        while True:
+            chunk = proc.stdout.read(65536)
+            if not chunk:
+                break
+            buffer += chunk
+            *entries, buffer = buffer.split(b'\0')
+            for entry in entries:
+                entry = entry.lstrip(b'\n')
+                if entry.startswith(b'\x01'):
+                    if header is not None:
+                        yield header[0], header[1:], paths
+                    header, paths = entry[1:].decode().split(), []
+                elif entry and header is not None:
+                    paths.append(os.fsdecode(entry))
+        if header is not None:
+            yield header[0], header[1:], paths
+
+    def _git_paths(self, *args: str) -> List[str]:
+        run_stats.count("subprocesses")
+        result = subprocess.run(['git', *args], cwd=self.root, capture_output=True)
+        if result.returncode != 0:
+            raise ValueError(result.stderr.decode(errors='replace').strip())
+        return [os.fsdecode(path) for path in result.stdout.split(b'\0') if path]
+
+    def changed_since(self, rev: str) -> List[str]:
+        """Paths that differ between rev and the working tree, plus untracked files"""
+        changed = self._git_paths('diff', '--name-only', '--no-renames', '-z', rev, '--')
+        untracked = self._git_paths('ls-files', '--others', '--exclude-standard', '-z')
+        return changed + untracked
+
+    def has_commit(self, rev: str) -> bool:
+        run_stats.count("subprocesses")
+        result = subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f'{rev}^{{commit}}'],
+                                cwd=self.root, capture_output=True)
+        return result.returncode == 0
+
+    def deleted_since(self, rev: str) -> List[str]:
+        """Paths that existed at rev and are gone from the working tree"""
+        return self._git_paths('diff', '--name-only', '--no-renames', '--diff-filter=D', '-z', rev, '--')
+
+    def blobs(self) -> Dict[str, Tuple[str, int]]:
+        """{path: (blob id, size)} of every file committed at HEAD"""
+        blobs = {}
+        for entry in self._git_paths('ls-tree', '-r', '-l', '-z', '--full-tree', 'HEAD'):
+            meta, _, rel_path = entry.partition('\t')
+            _, kind, oid, size = meta.split()
+            if kind == 'blob':
+                blobs[rel_path] = (oid, int(size))
+        return blobs
+
+    def blame(self, rel_path: str, content: str) -> Optional[List[Optional[BlameLine]]]:
+        """
+        Blame content as the working tree version of rel_path in one `git blame` run.
+
+        Returns one entry per line, None for lines not committed yet, or None
+        altogether when git cannot blame the path (e.g. it is untracked).
+        """
+        run_stats.count("subprocesses")
+        result = subprocess.run(
+            ['git', 'blame', '--porcelain', '--contents', '-', '--', rel_path],
+            cwd=self.root,
+            input=content.encode('utf-8', 'surrogateescape'),
+            capture_output=True,
+        )
+        if result.returncode != 0:
+            return None
+
+        lines: List[Optional[BlameLine]] = []
+        times: Dict[str, int] = {}
+        commit = None
+        header = True
+        for line in result.stdout.split(b'\n'):
+            if line.startswith(b'\t'):
+                # The line's content; the next line starts another entry
+                lines.append((times.get(commit, 0), commit) if commit.strip('0') else None)
+                header = True
+            elif header:
+                match = _BLAME_HEADER.match(line)
+                if match:
+                    commit = match.group(1).decode()
+                    header = False
+            elif line.startswith(b'committer-time '):
+                # Commit details only come with the first line of each commit
+                times[commit] = int(line.split()[1])
+        return lines
+
+    def lookup(self, rel_path: str) -> Optional[str]:
+        head = self.current_head()
+        if head != self.head:
+            self.reset(head)
+        if rel_path in self.commits:
+            return self.commits[rel_path]
+        while self._walk is not None:
+            try:
+                path, commit = next(self._walk)
+            except StopIteration:
+                break
+            self.commits.setdefault(path, commit)
+            if path == rel_path:
+                return commit
+        return None
+
+
+class CommitResolver:
+    """
+    Shared last-commit lookup for all parsers of a run.
+
+    Instead of forking `git log -n 1` per file, the history of each repository
+    is walked once and every touched path is recorded along the way. The walk
+    is advanced only as far as needed and restarts when HEAD moves.
+    """
+
+    def __init__(self, commits: Optional[Dict[str, str]] = None):
+        # Pre-resolved {real_path: commit} entries, e.g. handed to worker processes
+        self.commits = dict(commits or {})
+        self._histories: Dict[str, _RepoHistory] = {}
+        self._roots: Dict[str, Optional[str]] = {}
+
+    def _history_for(self, directory: str) -> Optional[_RepoHistory]:
+        if directory not in self._roots:
+            # GitPython takes a while to import; runs that never look up a commit skip it
+            import git
+
+            try:
+                repo = git.Repo(directory, search_parent_directories=True)
+            except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+                self._roots[directory] = None
+            else:
+                root = os.path.realpath(repo.working_tree_dir)
+                self._histories.setdefault(root, _RepoHistory(repo))
+                self._roots[directory] = root
+        root = self._roots[directory]
+        return self._histories[root] if root else None
+
+    def get_last_commit(self, file_path: Path) -> str:
+        """Get the full hash of the last commit that modified file_path, or "" if untracked"""
+        real_path = os.path.realpath(file_path)
+        if real_path in self.commits:
+            return self.commits[real_path]
+        history = self._history_for(os.path.dirname(real_path))
+        if history is None:
+            return ""
+        rel_path = Path(os.path.relpath(real_path, history.root)).as_posix()
+        return history.lookup(rel_path) or ""
+
+    def blame(self, file_path: Path, content: str) -> Optional[List[Optional[BlameLine]]]:
+        """
+        (committer time, commit) of each line of content, the current text of
+        file_path (see _RepoHistory.blame); None outside a repository
+        """
+        real_path = os.path.realpath(file_path)
+        history = self._history_for(os.path.dirname(real_path))
+        if history is None:
+            return None
+        return history.blame(Path(os.path.relpath(real_path, history.root)).as_posix(), content)
+
+    def head(self, directory: Path) -> Optional[str]:
+        """Current HEAD commit of the repository containing directory"""
+        history = self._history_for(os.path.realpath(directory))
+        return history.current_head() if history else None
+
+    def changed_since(self, directory: Path, rev: str) -> List[Path]:
+        """
+        Files of the repository containing directory that changed since rev.
+
+        Covers commits after rev, uncommitted edits and untracked files, without
+        walking or reading the tree. Deleted paths are left out.
+        """
+        history = self._history_for(os.path.realpath(directory))
+        if history is None:
+            raise ValueError(f"{directory} is not inside a git repository")
+        paths = (Path(history.root, rel_path) for rel_path in history.changed_since(rev))
+        return [path for path in paths if path.is_file()]
+
+    def has_commit(self, directory: Path, rev: str) -> bool:
+        """Whether rev names a commit of the repository containing directory"""
+        history = self._history_for(os.path.realpath(directory))
+        return history is not None and history.has_commit(rev)
+
+    def deleted_since(self, directory: Path, rev: str) -> List[Path]:
+        """Files of the repository containing directory that were deleted since rev"""
+        history = self._history_for(os.path.realpath(directory))
+        if history is None:
+            raise ValueError(f"{directory} is not inside a git repository")
+        return [Path(history.root, rel_path) for rel_path in history.deleted_since(rev)]
+
+    def blobs(self, directory: Path) -> Dict[str, Tuple[str, int]]:
+        """
+        {real_path: (blob id, size)} of the files committed at HEAD in the
+        repository containing directory. Unlike the files on disk, these are
+        the same on every checkout of a commit, whatever has been written
+        since or how line endings are converted. Empty outside a repository
+        or before the first commit.
+        """
+        history = self._history_for(os.path.realpath(directory))
+        if history is None:
+            return {}
+        try:
+            blobs = history.blobs()
+        except ValueError:
+            return {}
+        return {os.path.join(history.root, *rel_path.split('/')): blob for rel_path, blob in blobs.items()}
+
+    def work_tree(self, directory: Path) -> Optional[str]:
+        """Root of the working tree containing directory, or None outside a repository"""
+        history = self._history_for(os.path.realpath(directory))
+        return history.root if history else None
+
+    def resolve(self, file_paths: Iterable[Path]) -> Dict[str, str]:
+        """Resolve many files at once, returning {real_path: commit}"""
+        return {os.path.realpath(file_path): self.get_last_commit(file_path) for file_path in file_paths}
+
+    def close(self) -> None:
+        for history in self._histories.values():
+            history.close()
@@ -0,0 +1,80 @@
+"""
+HCL2 parsing with python-hcl2's grammar, compiled once per machine.
+
+Importing the hcl2 package compiles its Lark grammar on the spot and keeps
+the result next to the package, so wherever site-packages is read-only the
+grammar (about two seconds of work) is rebuilt on every run. This module
+loads the same grammar and transformer without importing the hcl2 package,
+only when the first Terraform file is parsed, and keeps the compiled parser
+in the user's cache directory. Lark checks the cached parser against the
+grammar and the Lark and Python versions, and rebuilds it when they differ.
+
+The grammar file and DictTransformer are python-hcl2 internals (4.x; see
+setup.py), so if they cannot be loaded, parsing falls back to hcl2.loads.
+"""
+import importlib.util
+import os
+import sys
+import threading
+import warnings
+from typing import Any, Optional
+
+_lock = threading.Lock()
+_parser: Any = None
+_transformer_class: Any = None
+# Set when the grammar could not be loaded directly and hcl2.loads is used instead
+_fallback = False
+
+
+def grammar_cache_path() -> Optional[str]:
+    """Where the compiled grammar is kept, or None when there is no writable cache directory"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    directory = os.path.join(base, "iac-tagger")
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return None
+    return os.path.join(directory, f"hcl2-py{sys.version_info[0]}{sys.version_info[1]}.lark")
+
+
+def _load() -> None:
+    global _parser, _transformer_class
+    from lark import Lark
+
+    spec = importlib.util.find_spec("hcl2")
+    if spec is None or not spec.submodule_search_locations:
+        raise ImportError("python-hcl2 is not installed")
+    package_dir = spec.submodule_search_locations[0]
+
+    # The transformer only depends on lark, so it is run from its file as
+    # is, leaving hcl2/__init__.py and its import-time grammar build alone
+    transformer_spec = importlib.util.spec_from_file_location(
+        "iac_tagger._hcl2_transformer", os.path.join(package_dir, "transformer.py"))
+    transformer = importlib.util.module_from_spec(transformer_spec)
+    transformer_spec.loader.exec_module(transformer)
+
+    _transformer_class = transformer.DictTransformer
+    # Same options as hcl2.parser, so results match hcl2.loads
+    _parser = Lark.open(os.path.join(package_dir, "hcl2.lark"), parser="lalr",
+                        cache=grammar_cache_path() or False, propagate_positions=True)
+
+
+def loads(text: str) -> dict:
+    """Parse HCL2 source into a dict, like hcl2.loads"""
+    global _fallback
+    if _parser is None and not _fallback:
+        with _lock:
+            if _parser is None and not _fallback:
+                try:
+                    _load()
+                except Exception as e:
+                    warnings.warn(f"Cannot load the HCL2 grammar of python-hcl2 directly ({e}), "
+                                  "using hcl2.loads, which rebuilds it on every run")
+                    _fallback = True
+    if _fallback:
+        import hcl2
+
+        return hcl2.loads(text)
+    # hcl2.loads' workaround for the grammar's lack of an end-of-file token
+    tree = _parser.parse(text + "\n")
+    return _transformer_class().transform(tree)
@@ -0,0 +1,249 @@
+"""
+Single-pass lexer that locates resource blocks and their tags in HCL source.
+
+The lexer only understands as much HCL as needed to find structure: it
+skips strings (including nested template interpolations), heredocs and
+comments, tracks bracket nesting, and records for every top-level
+`resource "type" "name" { ... }` block where the block starts and ends,
+where its `tags` attribute and object literals are, and where the tracking
+tag value sits. Offsets index into the source string.
+
+Only object literals that make up the tags value are recorded: the value
+itself, or the literal arguments of a merge(...) that is the value. Maps
+nested in them, `{ for ... }` expressions and the branches of conditionals
+are not, since a tag added there would not end up in the resource's tags.
+"""
+import re
+from typing import Dict, List, Optional, Set
+
+_TOKEN = re.compile(r'#[^\n]*|//[^\n]*|/\*|<<|"|[{}()\[\],?]|\n|[A-Za-z_][\w-]*|(?<![=!<>])=(?![=>])')
+_HEREDOC = re.compile(r'<<-?([A-Za-z_][\w-]*)[ \t]*\r?\n')
+_STRING_STOP = re.compile(r'["\\]|[$%]\{')
+_TEMPLATE_STOP = re.compile(r'["{}]')
+
+
+def skip_string(content: str, pos: int) -> int:
+    """Return the offset just past the string literal whose opening quote is at pos"""
+    i = pos + 1
+    while True:
+        m = _STRING_STOP.search(content, i)
+        if not m:
+            return len(content)
+        token = m.group()
+        if token == '"':
+            return m.end()
+        if token == '\\':
+            i = m.end() + 1
+        elif m.start() > 0 and content[m.start() - 1] == token[0]:
+            # $${ and %%{ are escaped literals, not interpolations
+            i = m.end()
+        else:
+            i = _skip_template(content, m.end())
+
+
+def _skip_template(content: str, pos: int) -> int:
+    """Return the offset just past the `}` closing the interpolation that starts at pos"""
+    depth = 1
+    i = pos
+    while depth:
+        m = _TEMPLATE_STOP.search(content, i)
+        if not m:
+            return len(content)
+        token = m.group()
+        if token == '"':
+            i = skip_string(content, m.start())
+            continue
+        depth += 1 if token == '{' else -1
+        i = m.end()
+    return i
+
+
+def _skip_heredoc(content: str, pos: int) -> Optional[int]:
+    """Return the offset past the heredoc opened at pos, or None if `<<` is no heredoc"""
+    m = _HEREDOC.match(content, pos)
+    if not m:
+        return None
+    terminator = re.compile(r'^[ \t]*' + re.escape(m.group(1)) + r'[ \t]*\r?$', re.MULTILINE)
+    end = terminator.search(content, m.end())
+    return end.end() if end else len(content)
+
+
+def index_resource_blocks(content: str, tag_key: str) -> Dict[str, dict]:
+    """
+    Index the resource blocks of an HCL file in one pass.
+
+    Args:
+        content (str): HCL source.
+        tag_key (str): Name of the tracking tag inside `tags`.
+
+    Returns:
+        dict: {"type.name": block} where block holds "start" (offset of the
+        `resource` keyword), "open"/"close" (offsets of the body braces),
+        "end" (just past the closing brace) and "tags", which is None when
+        the block has no top-level tags attribute, or holds "start",
+        "value_start", "value_end", "objects" (a list of [open, close] brace
+        offsets of the object literals in the value, e.g. both arguments of
+        merge(), but none of a conditional or `for` expression) and "tag"
+        (the [start, end) span of the quoted tracking tag value in one of
+        those objects, or None).
+    """
+    blocks: Dict[str, dict] = {}
+    stack: List[dict] = []
+    header: List[str] = []
+    header_start = 0
+    current: Optional[dict] = None
+    tags: Optional[dict] = None
+    attribute = None
+    pending_key = None
+    expect_tag_value = False
+    # Indexes of tags objects that turned out not to be literals of the value
+    dropped: Set[int] = set()
+    # A `?` at the top level of the tags value makes all of it conditional
+    conditional = False
+    previous = None
+    last_end = 0
+    pos = 0
+
+    while True:
+        m = _TOKEN.search(content, pos)
+        if not m:
+            break
+        token, start, pos = m.group(), m.start(), m.end()
+        first = token[0]
+
+        if first == '#' or token.startswith('//'):
+            continue
+        if token == '/*':
+            end = content.find('*/', pos)
+            pos = len(content) if end == -1 else end + 2
+            continue
+        if token == '\n':
+            if not stack:
+                header = []
+            elif len(stack) == 1 and current is not None:
+                if tags is not None and tags["value_end"] is None and tags["value_start"] is not None:
+                    tags["value_end"] = last_end
+                attribute = None
+            pending_key = None
+            continue
+        if token == '<<':
+            end = _skip_heredoc(content, start)
+            if end is None:
+                continue
+            pos = end
+
+        # Everything past this point is a significant token
+        if first == '"':
+            pos = skip_string(content, start)
+        in_tags_value = tags is not None and tags["value_end"] is None
+        if in_tags_value and tags["value_start"] is None:
+            tags["value_start"] = start
+        if expect_tag_value:
+            expect_tag_value = False
+            if first == '"':
+                tags["tag"] = [start, pos]
+        if previous == '{' and stack and stack[-1]["kind"] == 'tags_object' and token == 'for':
+            # `{ for k, v in ... : k => v }` builds a map, it does not list entries
+            dropped.add(stack[-1]["object"])
+            stack[-1]["kind"] = 'other'
+        frame = stack[-1]["kind"] if stack else None
+
+        if first == '<':
+            # Heredoc, already skipped
+            pass
+        elif first == '"':
+            if not stack:
+                if not header:
+                    header_start = start
+                header.append(content[start + 1:pos - 1])
+            elif frame == 'tags_object':
+                pending_key = content[start + 1:pos - 1]
+        elif first == '=':
+            if frame == 'resource' and attribute is not None and not in_tags_value:
+                if attribute[0] == 'tags':
+                    tags = {"start": attribute[1], "value_start": None, "value_end": None,
+                            "objects": [], "tag": None}
+                    current["tags"] = tags
+                attribute = None
+            elif frame == 'tags_object' and pending_key is not None:
+                expect_tag_value = pending_key == tag_key
+                pending_key = None
+        elif first == '?':
+            if in_tags_value and frame == 'resource':
+                conditional = True
+            elif frame == 'merge':
+                stack[-1]["conditional"] = True
+        elif first == ',':
+            if frame == 'merge':
+                _end_argument(stack[-1], dropped)
+        elif first in '{([':
+            kind = 'other'
+            if not stack:
+                if first == '{' and len(header) == 3 and header[0] == 'resource':
+                    kind = 'resource'
+                    current = {"start": header_start, "open": start, "close": None, "end": None, "tags": None}
+                    blocks[f"{header[1]}.{header[2]}"] = current
+                    tags = None
+                header = []
+            elif first == '{' and in_tags_value and frame in ('resource', 'merge'):
+                kind = 'tags_object'
+                tags["objects"].append([start, None])
+                if frame == 'merge':
+                    stack[-1]["objects"].append(len(tags["objects"]) - 1)
+            elif first == '(' and in_tags_value and frame == 'resource' and previous == 'merge':
+                kind = 'merge'
+            stack.append({"kind": kind, "object": len(tags["objects"]) - 1 if kind == 'tags_object' else None,
+                          "objects": [], "conditional": False})
+            pending_key = None
+        elif first in '})]':
+            if stack:
+                closed = stack.pop()
+                if closed["kind"] == 'resource':
+                    if tags is not None:
+                        if tags["value_end"] is None:
+                            tags["value_end"] = last_end
+                        _drop_objects(tags, set(range(len(tags["objects"]))) if conditional else dropped)
+                    current["close"] = start
+                    current["end"] = pos
+                    current = tags = None
+                    dropped = set()
+                    conditional = False
+                elif closed["kind"] == 'merge':
+                    _end_argument(closed, dropped)
+                elif closed["kind"] == 'tags_object':
+                    tags["objects"][closed["object"]][1] = start
+            pending_key = None
+        else:
+            # Identifier
+            if not stack:
+                if not header:
+                    header_start = start
+                header.append(token)
+            elif frame == 'resource' and not in_tags_value:
+                attribute = (token, start)
+            elif frame == 'tags_object':
+                pending_key = token
+
+        last_end = pos
+        previous = token
+
+    return blocks
+
+
+def _end_argument(merge: dict, dropped: Set[int]) -> None:
+    """Close the current argument of a merge(...) frame, dropping its objects if it was conditional"""
+    if merge["conditional"]:
+        dropped.update(merge["objects"])
+    merge["objects"] = []
+    merge["conditional"] = False
+
+
+def _drop_objects(tags: dict, dropped: Set[int]) -> None:
+    """Forget the tags objects at the given indexes, and the tracking tag if it sat in one of them"""
+    if not dropped:
+        return
+    for index in dropped:
+        open_pos, close = tags["objects"][index]
+        if tags["tag"] and open_pos < tags["tag"][0] and (close is None or tags["tag"][1] <= close):
+            tags["tag"] = None
+    tags["objects"] = [obj for index, obj in enumerate(tags["objects"]) if index not in dropped]
@@ -1,27 +1,340 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Tuple, Union
 import subprocess
 import hashlib
-import hcl2
-import re
+import bisect
 import json
+import re
+
+from iac_tagger.git_history import BlameLine, CommitResolver
+from iac_tagger.stats import run_stats
+from iac_tagger.writeback import replace_file
+
+# What lookup_commits found: a file's last commit, or the blame of its lines
+_Found = Union[str, Optional[List[Optional[BlameLine]]]]
 
 class IaCParser(ABC):
     """Base abstract class for IaC parsers"""
+    TAG_KEY = "iac_tagger"
+    # Which commit tags record: the file's last commit, or per resource (see ATTRIBUTIONS)
+    attribution = "file"
+    # Optional Inventory that tagging records every resource's tag and location in
+    inventory = None
+    # Optional WriteBack that defers the directory fsyncs of writes (see write_file)
+    writeback = None
+
+    def __init__(self, commit_resolver=None, resource_cache=None):
+        # Optional CommitResolver shared by all parsers of a run
+        self.commit_resolver = commit_resolver
+        # Optional ResourceCache that lets unchanged files skip parsing
+        self.resource_cache = resource_cache
     
     @abstractmethod
-    def add_tracking_tag(self, file_path: Path, resource_id: str) -> bool:
-        """Add tracking tag to resource if needed"""
+    def load_resources(self, content: str) -> Tuple[Any, Dict[str, dict]]:
+        """
+        Parse file content once.
+
+        Returns:
+            tuple: The parsed document and a dict of {resource_id: resource_config}.
+        """
         pass
-    
+
     @abstractmethod
+    def get_tag(self, resource: dict) -> Optional[str]:
+        """Return the tracking tag currently set on a parsed resource"""
+        pass
+
+    def apply_tags(self, content: str, index: Dict[str, dict], new_tags: Dict[str, str]) -> str:
+        """
+        Return content with every {resource_id: tag} in new_tags applied.
+
+        Each index entry may carry an "edit" of [start, end, before, after]:
+        content[start:end] becomes before + format_tag(tag) + after. Only
+        those spans are rewritten; the rest of the file is left untouched.
+        """
+        edits = []
+        for resource_id, new_tag in new_tags.items():
+            edit = index[resource_id].get("edit")
+            if edit:
+                start, end, before, after = edit
+                edits.append((start, end, before + self.format_tag(new_tag) + after))
+        return self.splice(content, edits)
+
+    def format_tag(self, value: str) -> str:
+        """Render a tag value as a literal of the file's language"""
+        return json.dumps(value)
+
+    def get_spans(self, content: str, parsed: Any) -> Dict[str, Tuple[int, int]]:
+        """Return {resource_id: (start, end)} offsets of each resource in content"""
+        return {}
+
     def get_resources(self, file_path: Path) -> Dict[str, dict]:
         """Get all resources from the IaC file"""
-        pass
+        _, resources = self.load_resources(self.read_file(file_path))
+        return resources
+
+    def add_tracking_tag(self, file_path: Path, resource_id: str) -> bool:
+        """Add tracking tag to resource if needed"""
+        return self.add_tracking_tags(file_path, [resource_id])
+
+    def add_tracking_tags(self, file_path: Path, resource_ids: Optional[Iterable[str]] = None) -> bool:
+        """
+        Add or refresh tracking tags for all resources of a file in one pass.
+
+        The file is read and parsed once, every stale tag is computed in memory,
+        all edits are applied together and the result is written back once.
+
+        Args:
+            file_path (Path): The IaC file to tag.
+            resource_ids (iterable, optional): Restrict tagging to these resources.
+
+        Returns:
+            bool: True if the file was modified.
+        """
+        return self.tag_file(file_path, resource_ids)[0]
+
+    def tag_file(self, file_path: Path, resource_ids: Optional[Iterable[str]] = None) -> Tuple[bool, int]:
+        """Like add_tracking_tags, returning (modified, number of resources in the file)"""
+        content = self.read_file(file_path)
+        index = self.index_resources(content)
+        new_content = None
+        if index:
+            new_content = self.retag_content(content, index, self.get_commits(file_path, content, index),
+                                             resource_ids)
+        modified = new_content is not None and self.write_file(file_path, new_content, content)
+        if self.inventory is not None:
+            self.record_inventory(file_path, new_content if modified else content)
+        return modified, len(index)
+
+    def record_inventory(self, file_path: Path, content: str) -> None:
+        """
+        Replace the inventory rows of a file with the resources of content,
+        its text as tagged. A freshly written file is indexed once more to
+        locate its resources, which also primes the resource cache for the
+        next run.
+        """
+        index = self.index_resources(content)
+        line_starts = _line_starts(content)
+        rows = []
+        for resource_id, entry in index.items():
+            span = entry.get("span")
+            if span:
+                first, last = _line_range(line_starts, span)
+                rows.append((resource_id, entry["tag"], first + 1, last + 1))
+            else:
+                rows.append((resource_id, entry["tag"], None, None))
+        with run_stats.phase("inventory"):
+            self.inventory.update_file(file_path, rows)
+
+    def tag_content(self, file_path: Path, content: str,
+                    resource_ids: Optional[Iterable[str]] = None) -> Optional[str]:
+        """Return content with up-to-date tracking tags, or None if nothing changes"""
+        index = self.index_resources(content)
+        if not index:
+            return None
+        return self.retag_content(content, index, self.get_commits(file_path, content, index), resource_ids)
+
+    def retag_content(self, content: str, index: Dict[str, dict], commit_hash: Union[str, Dict[str, str]],
+                      resource_ids: Optional[Iterable[str]] = None) -> Optional[str]:
+        """
+        Second half of tag_content, for callers that index the content and
+        look up the commits themselves (e.g. concurrently). commit_hash is
+        the file's commit or, with resource attribution, {resource_id: commit}.
+        """
+        targets = index
+        if resource_ids is not None:
+            wanted = set(resource_ids)
+            targets = {rid: entry for rid, entry in index.items() if rid in wanted}
+        new_tags = {}
+        for resource_id, entry in targets.items():
+            new_tag = self.expected_tag(resource_id, entry, _commit_of(commit_hash, resource_id))
+            if entry['tag'] != new_tag:
+                new_tags[resource_id] = new_tag
+
+        if not new_tags:
+            return None
+        with run_stats.phase("splice"):
+            new_content = self.apply_tags(content, index, new_tags)
+        # Resources whose tags cannot be edited leave the content as it was
+        return new_content if new_content != content else None
+
+    def expected_tag(self, resource_id: str, entry: dict, commit_hash: str) -> str:
+        """The up-to-date tracking tag of an indexed resource"""
+        return f"{resource_id}:{entry['hash']}:{commit_hash}"
+
+    def check_tags(self, file_path: Path) -> Dict[str, str]:
+        """
+        Compare the tracking tags of a file with the expected ones, without writing.
+
+        The file is only ever opened for reading.
+
+        Returns:
+            dict: {resource_id: status}, where status is "current", "stale"
+            (tagged, but not with the expected value), "missing" or
+            "untaggable" (not current, and its tags cannot be edited, e.g.
+            `tags = var.tags`, so tagging would not change it either).
+        """
+        content = self.read_file(file_path)
+        index = self.index_resources(content)
+        if not index:
+            return {}
+        return self.check_index(index, self.get_commits(file_path, content, index))
+
+    def check_index(self, index: Dict[str, dict], commit_hash: Union[str, Dict[str, str]]) -> Dict[str, str]:
+        """Second half of check_tags, for callers that index the content and look up the commits themselves"""
+        statuses = {}
+        for resource_id, entry in index.items():
+            if entry['tag'] is not None and \
+                    entry['tag'] == self.expected_tag(resource_id, entry, _commit_of(commit_hash, resource_id)):
+                statuses[resource_id] = "current"
+            elif "edit" in entry and entry["edit"] is None:
+                # Parsers that locate edits report where they cannot make one
+                statuses[resource_id] = "untaggable"
+            elif entry['tag'] is None:
+                statuses[resource_id] = "missing"
+            else:
+                statuses[resource_id] = "stale"
+        return statuses
+
+    def index_resources(self, content: str) -> Dict[str, dict]:
+        """
+        Summarize the resources of content for tagging, through the resource cache if any.
+
+        Returns:
+            dict: {resource_id: {"hash", "tag", "span", ...}}, with whatever
+            else the parser's apply_tags needs to edit the file without parsing
+            it again.
+        """
+        key = None
+        if self.resource_cache is not None:
+            key = self.resource_cache.key(self.cache_namespace(), content)
+            with run_stats.phase("cache.get"):
+                index = self.resource_cache.get(key)
+            if index is not None:
+                run_stats.count("cache_hits")
+                return index
+            run_stats.count("cache_misses")
+
+        index = self.index_content(content)
+        run_stats.count("resources", len(index))
+        if key is not None:
+            with run_stats.phase("cache.put"):
+                self.resource_cache.put(key, index)
+        return index
+
+    def cache_namespace(self) -> str:
+        """What resource cache keys record, besides the content, of how it was indexed"""
+        return f"{type(self).__name__}/{INDEX_VERSION}"
+
+    def index_content(self, content: str) -> Dict[str, dict]:
+        """Build the index of index_resources by parsing content"""
+        parsed, resources = self.load_resources(content)
+        spans = self.get_spans(content, parsed)
+        return {
+            resource_id: {
+                "hash": self.generate_resource_hash(resource, self.TAG_KEY),
+                "tag": self.get_tag(resource),
+                "span": spans.get(resource_id),
+            }
+            for resource_id, resource in resources.items()
+        }
+
+    @staticmethod
+    def splice(content: str, edits: Iterable[Tuple[int, int, str]]) -> str:
+        """Replace each non-overlapping (start, end) range of content with its text"""
+        pieces = []
+        position = 0
+        for start, end, text in sorted(edits, key=lambda edit: edit[0]):
+            pieces.append(content[position:start])
+            pieces.append(text)
+            position = end
+        pieces.append(content[position:])
+        return ''.join(pieces)
+
+    def read_file(self, file_path: Path) -> str:
+        # newline='' keeps line endings as they are, so untouched bytes stay identical
+        with run_stats.phase("read"), open(file_path, 'r', newline='') as f:
+            content = f.read()
+            run_stats.add_bytes("read", f.tell())
+        return content
+
+    def write_file(self, file_path: Path, content: str, original: Optional[str] = None) -> bool:
+        """
+        Atomically replace file_path with content (temp file + rename),
+        unless content is identical to original, the text it was read as,
+        in which case the file and its mtime are left alone. The data is
+        synced before the rename; the rename itself at once, or by the next
+        flush of the parser's writeback.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        if content == original:
+            run_stats.count("writes_skipped")
+            return False
+        with run_stats.phase("write"):
+            run_stats.add_bytes("write", replace_file(file_path, content,
+                                                           sync_directory=self.writeback is None))
+        if self.writeback is not None:
+            self.writeback.add(file_path)
+        return True
     
+    def get_commits(self, file_path: Path, content: str,
+                    index: Dict[str, dict]) -> Union[str, Dict[str, str]]:
+        """The commit(s) the resources of an indexed file are tagged with (see attribution)"""
+        with run_stats.phase("commit"):
+            found = self.lookup_commits(file_path, content)
+        return self.attribute_commits(content, index, found)
+
+    def lookup_commits(self, file_path: Path, content: str) -> _Found:
+        """
+        First half of get_commits, the part that asks git: the file's last
+        commit, or with resource attribution the blame of content
+        """
+        if self.attribution != "resource":
+            return self.get_last_commit(file_path)
+        commit_resolver = self.commit_resolver or CommitResolver()
+        return commit_resolver.blame(file_path, content)
+
+    def attribute_commits(self, content: str, index: Dict[str, dict],
+                          found: _Found) -> Union[str, Dict[str, str]]:
+        """
+        Second half of get_commits: with resource attribution, each resource
+        gets the newest commit among the lines of its span. Lines holding
+        the tracking tag are skipped, as are blank lines, bracket-only lines
+        and bare `tags = {` / `labels:` openers, which tagging adds around
+        the tag, so committing the tags does not make the resources look
+        changed. Resources without a span get the newest commit of the file.
+        """
+        if isinstance(found, str):
+            return found
+        blamed = found or []
+        lines = content.split('\n')
+        line_starts = _line_starts(content)
+
+        def newest(first: int, last: int) -> str:
+            commits = [blamed[i] for i in range(first, min(last + 1, len(blamed)))
+                       if blamed[i] is not None and self.TAG_KEY not in lines[i]
+                       and not _TAG_SCAFFOLDING.match(lines[i])]
+            # reduce hash size on commit hash
+            return max(commits)[1][:8] if commits else ""
+
+        commits = {}
+        for resource_id, entry in index.items():
+            span = entry.get("span")
+            if span:
+                commits[resource_id] = newest(*_line_range(line_starts, span))
+            else:
+                commits[resource_id] = newest(0, len(lines) - 1)
+        return commits
+
     def get_last_commit(self, file_path: Path) -> str:
         """Get the last git commit that modified this file"""
+        if self.commit_resolver is not None:
+            # reduce hash size on commit hash
+            return self.commit_resolver.get_last_commit(file_path)[:8]
+        run_stats.count("subprocesses")
         try:
             result = subprocess.run(
                 ['git', 'log', '-n', '1', '--pretty=format:%H', str(file_path)],
@@ -33,112 +346,174 @@ class IaCParser(ABC):
         except subprocess.CalledProcessError:
             return "no_git_history"
     
-    def generate_resource_hash(self,resource_content, iac_tagger_prefix="iac_tagger"):
+    def generate_resource_hash(self, resource_content, iac_tagger_prefix="iac_tagger"):
         """
         Generate a consistent hash for Kubernetes/Terraform resources by ignoring specified tags/labels.
+
+        Parsed resources (dicts or lists) are hashed structurally: the tree is
+        walked once in canonical order and fed straight into SHA256, with the
+        tagger entry dropped wherever it occurs (see canonical_hash). Raw
+        strings fall back to regex cleanup.
         
         Args:
-            resource_content (str or dict): Resource content in HCL/K8s manifest (as a string) or a parsed dictionary.
+            resource_content (str, dict or list): Resource content in HCL/K8s manifest (as a string) or a parsed tree.
             iac_tagger_prefix (str): The configurable prefix to identify and remove the tagger (default: "iac_tagger").
         
         Returns:
             str: A SHA256 hash of the cleaned resource content.
         """
-        def clean_tags_and_labels(content, prefix):
-            # Regex to match labels/tags with the specified prefix
-            tagger_pattern = rf'["\']{prefix}["\']\s*:\s*["\'][^"\']+["\'],?'
-            
-            # Remove matching labels or tags
-            content = re.sub(tagger_pattern, '', content)
-            
-            # Remove empty tag/label containers
-            content = re.sub(r'["\'](tags|labels)["\']\s*:\s*{\s*}', '', content)
-            content = re.sub(r'["\'](tags|labels)["\']\s*:\s*\[\s*\]', '', content)
-            
-            # Clean up artifacts (e.g., trailing commas or redundant spaces)
-            content = re.sub(r',\s*}', '}', content)
-            content = re.sub(r'\s+', '', content)
-            content = re.sub(r',+', ',', content)
-            
-            return content
+        if isinstance(resource_content, (dict, list)):
+            with run_stats.phase("hash"):
+                return canonical_hash(resource_content, iac_tagger_prefix)
 
-        if isinstance(resource_content, str):
+        elif isinstance(resource_content, str):
             # Handle HCL or Kubernetes manifest as string
-            # Remove "merge()" calls for Terraform
-            cleaned_content = re.sub(
-                r'tags\s*=\s*merge\([^)]+\)', 
-                'tags = {}', 
-                resource_content
-            )
-            
-            # Remove standard tags in HCL (e.g., `tags = {}`)
-            cleaned_content = re.sub(
-                r'tags\s*=\s*{[^}]+}', 
-                'tags = {}', 
-                cleaned_content
-            )
-            
-            # Apply the cleaning logic for tags/labels
-            cleaned_content = clean_tags_and_labels(cleaned_content, iac_tagger_prefix)
-            # Generate hash
-            full_hash = hashlib.sha256(cleaned_content.encode()).hexdigest()
-            # reduce hash size
-            return full_hash[:8]
-        
-        elif isinstance(resource_content, dict):
-            # Handle already parsed dictionary content (e.g., for Kubernetes manifests)
-            json_content = json.dumps(resource_content, sort_keys=True, separators=(',', ':'))
-            
-            # Apply the cleaning logic for tags/labels
-            cleaned_content = clean_tags_and_labels(json_content, iac_tagger_prefix)
-            
+            # Remove "merge()" calls and standard tags in HCL (e.g., `tags = {}`)
+            cleaned_content = _HCL_MERGE_TAGS.sub('tags = {}', resource_content)
+            cleaned_content = _HCL_TAGS.sub('tags = {}', cleaned_content)
+
+            # Remove the tagger entry, then empty tag/label containers
+            cleaned_content = _tagger_entry_pattern(iac_tagger_prefix).sub('', cleaned_content)
+            cleaned_content = _EMPTY_CONTAINER.sub('', cleaned_content)
+
+            # Clean up artifacts (e.g., trailing commas or redundant spaces)
+            cleaned_content = _TRAILING_COMMA.sub('}', cleaned_content)
+            cleaned_content = _WHITESPACE.sub('', cleaned_content)
+            cleaned_content = _REPEATED_COMMA.sub(',', cleaned_content)
+
             # Generate hash
             full_hash = hashlib.sha256(cleaned_content.encode()).hexdigest()
             # reduce hash size
             return full_hash[:8]
         
         else:
-            raise TypeError("Resource content must be either a string or a dictionary.")
+            raise TypeError("Resource content must be either a string, a dictionary or a list.")
 
-class TerraformParser(IaCParser):
-    TAG_KEY = "iac_tagger"
-    
-    def get_resources(self, file_path: Path) -> Dict[str, dict]:
-        with open(file_path, 'r') as f:
-            tf_dict = hcl2.load(f)
-            
-        resources = {}
-        for block_type, blocks in tf_dict.items():
-            if block_type == "resource":
-                for resource in blocks:
-                    for resource_type, resource_configs in resource.items():
-                        for resource_name, config in resource_configs.items():
-                            resource_id = f"{resource_type}.{resource_name}"
-                            resources[resource_id] = config
-        return resources
-    
-    def add_tracking_tag(self, file_path: Path, resource_id: str) -> bool:
-        resources = self.get_resources(file_path)
-        if resource_id not in resources:
-            return False
-            
-        resource = resources[resource_id]
-        current_hash = self.generate_resource_hash(str(resource))
-        commit_hash = self.get_last_commit(file_path)
-        
-        # Check if tag already exists and is current
-        if "tags" in resource:
-            existing_tag = resource["tags"].get(self.TAG_KEY)
-            if existing_tag == f"{resource_id}:{current_hash}:{commit_hash}":
-                return False
-                
-        # Update the file with new tag
-        with open(file_path, 'r') as f:
-            content = f.read()
-            
-        # Add or update tag
-        new_tag = f'{resource_id}:{current_hash}:{commit_hash}'
-        # Implementation of actual file modification would go here
-        # This is a simplified version - you'd need proper HCL modification logic
-        
-        return True 
\ No newline at end of file
+
+# Bump whenever resource hashes or index entries change meaning, so cached
+# indexes from older releases are not reused
+INDEX_VERSION = 5
+
+# Outcomes of IaCParser.check_tags per resource
+CHECK_STATUSES = ("current", "stale", "missing", "untaggable")
+
+# Statuses that fail a check: tagging would change them
+DRIFT_STATUSES = ("stale", "missing")
+
+# Values of IaCParser.attribution: the commit in a tag is the last one that
+# touched the file, or the newest one among the resource's own lines
+ATTRIBUTIONS = ("file", "resource")
+
+_NEWLINE = re.compile(r'\n')
+_TAG_SCAFFOLDING = re.compile(r'\s*(?:(?:tags|labels)\s*[=:]\s*\{?|[{}\[\](),]*)\s*\Z')
+_HCL_MERGE_TAGS = re.compile(r'tags\s*=\s*merge\([^)]+\)')
+_HCL_TAGS = re.compile(r'tags\s*=\s*{[^}]+}')
+_EMPTY_CONTAINER = re.compile(r'["\'](tags|labels)["\']\s*:\s*(\{\s*\}|\[\s*\])')
+_TRAILING_COMMA = re.compile(r',\s*}')
+_WHITESPACE = re.compile(r'\s+')
+_REPEATED_COMMA = re.compile(r',+')
+_tagger_patterns: Dict[Tuple[str, str], "re.Pattern"] = {}
+
+
+def _tagger_entry_pattern(prefix: str, syntax: str = "json") -> "re.Pattern":
+    """Compiled pattern matching a `prefix: value` (json) or `prefix = "value"` (hcl) entry"""
+    key = (prefix, syntax)
+    if key not in _tagger_patterns:
+        if syntax == "hcl":
+            # hcl2 renders object literals inside expressions either way:
+            # {iac_tagger = "..."} or {'iac_tagger': '...'}
+            pattern = rf'["\']?{re.escape(prefix)}["\']?\s*[=:]\s*["\'][^"\']*["\']\s*,?'
+        else:
+            pattern = rf'["\']{re.escape(prefix)}["\']\s*:\s*["\'][^"\']+["\'],?'
+        _tagger_patterns[key] = re.compile(pattern)
+    return _tagger_patterns[key]
+
+
+def _strip_tagger(value: Any, prefix: str) -> Any:
+    """Drop the tagger entry from a tags/labels value"""
+    if isinstance(value, dict):
+        if prefix in value:
+            return {key: item for key, item in value.items() if key != prefix}
+    elif isinstance(value, str) and prefix in value:
+        # Terraform expressions such as merge() come back from hcl2 as strings
+        stripped = _tagger_entry_pattern(prefix, "hcl").sub('', value)
+        return _TRAILING_COMMA.sub('}', stripped)
+    return value
+
+
+def _line_starts(content: str) -> List[int]:
+    """Offset at which each line of content starts"""
+    return [0] + [match.end() for match in _NEWLINE.finditer(content)]
+
+
+def _line_range(line_starts: List[int], span: Tuple[int, int]) -> Tuple[int, int]:
+    """0-based first and last line of a (start, end) span of offsets"""
+    start, end = span
+    first = bisect.bisect_right(line_starts, start) - 1
+    last = bisect.bisect_right(line_starts, max(start, end - 1)) - 1
+    return first, last
+
+
+def _commit_of(commit_hash: Union[str, Dict[str, str]], resource_id: str) -> str:
+    """The commit of one resource, from a file's commit or a {resource_id: commit} map"""
+    return commit_hash if isinstance(commit_hash, str) else commit_hash.get(resource_id, "")
+
+
+def _update_str(digest, value: str, type_code: bytes = b's') -> None:
+    encoded = value.encode('utf-8', 'surrogatepass')
+    digest.update(b'%s%d:' % (type_code, len(encoded)))
+    digest.update(encoded)
+
+
+def canonical_hash(value: Any, prefix: str = "iac_tagger") -> str:
+    """
+    Short structural hash of a parsed resource, ignoring its tracking tag.
+
+    The tagger key is dropped from every mapping, not only from tags and
+    labels: a YAML alias of a labels mapping (e.g. `selector: *labels`)
+    carries the tag along, and must not change the hash either.
+    """
+    digest = hashlib.sha256()
+    _update_canonical(digest, value, prefix)
+    # reduce hash size
+    return digest.hexdigest()[:8]
+
+
+def _update_canonical(digest, value: Any, prefix: str) -> None:
+    """
+    Feed a canonical, type- and length-prefixed encoding of a parsed tree into digest.
+    Mapping keys are sorted, and empty tags/labels left after dropping the
+    tagger entry are skipped, so tagging a resource never changes its hash.
+    """
+    if isinstance(value, dict):
+        items = []
+        for key, item in value.items():
+            if key == prefix:
+                continue
+            if key in ('tags', 'labels'):
+                item = _strip_tagger(item, prefix)
+                if item is None or (isinstance(item, (dict, list)) and not item):
+                    continue
+            items.append((str(key), item))
+        items.sort(key=lambda kv: kv[0])
+        digest.update(b'd%d:' % len(items))
+        for key, item in items:
+            _update_str(digest, key)
+            _update_canonical(digest, item, prefix)
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'l%d:' % len(value))
+        for item in value:
+            _update_canonical(digest, item, prefix)
+    elif isinstance(value, str):
+        _update_str(digest, value)
+    elif value is None:
+        digest.update(b'n')
+    elif isinstance(value, bool):
+        digest.update(b'b1' if value else b'b0')
+    elif isinstance(value, int):
+        digest.update(b'i%d;' % value)
+    elif isinstance(value, float):
+        digest.update(b'f%s;' % repr(value).encode())
+    else:
+        # Timestamps and other YAML scalars
+        _update_str(digest, str(value), b'o')
@@ -0,0 +1,183 @@
+"""
+Inventory of tracked resources: where each tracking tag lives in the source.
+
+Tagging runs with an inventory record, for every file they process, the
+tag, ID, hash and commit of each resource together with the file and line
+span it sits in, replacing that file's earlier rows and leaving every other
+row alone. Files are recorded by their path in the repository (relative to
+the inventory's root, the git work tree), so every checkout and CI machine
+records the same paths. A tag found on running infrastructure is then
+traced back to its code with an indexed query rather than a search of the
+repository:
+
+    iac-tagger lookup 'aws_s3_bucket.logs:1a2b3c4d:5e6f7a8b'
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# (resource_id, tag, start_line, end_line); lines are 1-based and inclusive
+InventoryRow = Tuple[str, Optional[str], Optional[int], Optional[int]]
+
+# Bumped when stored rows change meaning; older inventories are rebuilt from scratch
+INVENTORY_VERSION = 2
+
+# Columns lookup() can search, by the name used on the command line
+LOOKUP_FIELDS = {
+    "tag": "tag",
+    "resource": "resource_id",
+    "hash": "hash",
+    "commit": "commit_hash",
+}
+
+
+class Inventory:
+    """
+    SQLite table of resources, indexed on tag, resource ID, hash and commit.
+
+    The hash and commit are the ones recorded in the resource's tag, as seen
+    on the deployed resource, and are NULL for untagged resources. Paths are
+    stored relative to root (see path_key); files outside it keep their
+    absolute path. An instance may be shared by threads; worker processes
+    open their own.
+    """
+    DEFAULT_NAME = "inventory.sqlite"
+
+    def __init__(self, db_path: str, root: Optional[str] = None):
+        self.db_path = Path(db_path)
+        self.root = os.path.realpath(root) if root else None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                if self._conn.execute("PRAGMA user_version").fetchone()[0] != INVENTORY_VERSION:
+                    # Rows of an older layout (e.g. absolute paths) would never be replaced
+                    with self._conn:
+                        self._conn.execute("DROP TABLE IF EXISTS resources")
+                        self._conn.execute(f"PRAGMA user_version = {INVENTORY_VERSION}")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS resources ("
+                    " path TEXT NOT NULL, resource_id TEXT NOT NULL, tag TEXT, hash TEXT, commit_hash TEXT,"
+                    " start_line INTEGER, end_line INTEGER)"
+                )
+                for column in ("path", *LOOKUP_FIELDS.values()):
+                    self._conn.execute(f"CREATE INDEX IF NOT EXISTS resources_{column} ON resources ({column})")
+            return self._conn
+
+    def path_key(self, file_path: Union[str, Path]) -> str:
+        """Path a file is stored under: posix and relative to root when inside it, else absolute"""
+        path = os.path.realpath(file_path)
+        if self.root:
+            rel_path = os.path.relpath(path, self.root)
+            if rel_path != os.pardir and not rel_path.startswith(os.pardir + os.sep):
+                return Path(rel_path).as_posix()
+        return Path(path).as_posix()
+
+    def update_file(self, file_path: Path, rows: Iterable[InventoryRow]) -> None:
+        """Replace the rows of one file, in a single transaction"""
+        path = self.path_key(file_path)
+        records = [(path, resource_id, tag, *_tag_parts(resource_id, tag), start_line, end_line)
+                   for resource_id, tag, start_line, end_line in rows]
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM resources WHERE path = ?", (path,))
+            self.conn.executemany(
+                "INSERT INTO resources (path, resource_id, tag, hash, commit_hash, start_line, end_line)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+
+    def remove_files(self, file_paths: Iterable[Union[str, Path]]) -> None:
+        """Drop the rows of files, e.g. of deleted ones"""
+        paths = [(self.path_key(file_path),) for file_path in file_paths]
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM resources WHERE path = ?", paths)
+
+    def prune(self, directory: Union[str, Path], seen: Iterable[Union[str, Path]], recursive: bool = True) -> int:
+        """
+        Drop the rows of files under directory that are not in seen, the
+        files a complete run over it discovered: deleted, moved or newly
+        ignored files. Without recursive only the directory's own files are
+        considered. Returns the number of files dropped.
+        """
+        keep = {self.path_key(file_path) for file_path in seen}
+        prefix = self.path_key(directory)
+        prefix = "" if prefix == "." else prefix.rstrip("/") + "/"
+        with self._lock:
+            stored = [path for (path,) in self.conn.execute("SELECT DISTINCT path FROM resources")]
+        stale = []
+        for path in stored:
+            if path in keep or not path.startswith(prefix):
+                continue
+            if not prefix and path.startswith("/"):
+                # Absolute: outside the root, so not under a directory given relative to it
+                continue
+            if not recursive and "/" in path[len(prefix):]:
+                continue
+            stale.append(path)
+        if stale:
+            with self._lock, self.conn:
+                self.conn.executemany("DELETE FROM resources WHERE path = ?", [(path,) for path in stale])
+        return len(stale)
+
+    def lookup(self, value: str, field: str = "tag") -> List[Dict[str, object]]:
+        """
+        Find resources by tag (the default), resource ID, hash or commit.
+
+        A commit may be given in full or as a prefix of the abbreviated
+        hash recorded in tags.
+
+        Returns:
+            list: {"path" (see path_key), "resource_id", "tag", "hash", "commit", "start_line",
+            "end_line"} dicts, ordered by path and line.
+        """
+        if field not in LOOKUP_FIELDS:
+            raise ValueError(f"Unknown lookup field {field!r}, expected one of: {', '.join(LOOKUP_FIELDS)}")
+        column = LOOKUP_FIELDS[field]
+        if field == "commit" and len(value) > 8:
+            # Tags record abbreviated commits
+            value = value[:8]
+        condition = f"{column} = ?"
+        parameters: Tuple = (value,)
+        if field == "commit" and len(value) < 8:
+            # Range scan on the index rather than LIKE, which SQLite would not index
+            condition = f"{column} >= ? AND {column} < ?"
+            parameters = (value, value + "\uffff")
+        with self._lock:
+            if self._conn is None and not self.db_path.exists():
+                return []
+            rows = self.conn.execute(
+                "SELECT path, resource_id, tag, hash, commit_hash, start_line, end_line FROM resources"
+                f" WHERE {condition} ORDER BY path, start_line",
+                parameters,
+            ).fetchall()
+        keys = ("path", "resource_id", "tag", "hash", "commit", "start_line", "end_line")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _tag_parts(resource_id: str, tag: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(hash, commit) recorded in a `resource_id:hash:commit` tag, or (None, None)"""
+    if not tag or not tag.startswith(resource_id + ":"):
+        return None, None
+    parts = tag[len(resource_id) + 1:].split(":")
+    if len(parts) != 2:
+        return None, None
+    return parts[0] or None, parts[1] or None
+
+
+def default_inventory_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, Inventory.DEFAULT_NAME)
@@ -1,70 +1,193 @@
 import yaml
 from pathlib import Path
-from typing import Dict, Any
-from iac_tagger.iac_parser import IaCParser
-from abc import ABC, abstractmethod
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from iac_tagger.iac_parser import IaCParser, canonical_hash
+from iac_tagger.yaml_backend import get_yaml_backend
+from iac_tagger.stats import run_stats
 
 class KubernetesParser(IaCParser):
     LABEL_KEY = "iac_tagger"
-    
-    def get_resources(self, file_path: Path) -> Dict[str, dict]:
-        with open(file_path, 'r') as f:
-            # Handle multi-document YAML files
-            documents = list(yaml.safe_load_all(f))
-            
+
+    def __init__(self, commit_resolver=None, resource_cache=None, yaml_backend: str = "auto"):
+        super().__init__(commit_resolver, resource_cache)
+        self.yaml = get_yaml_backend(yaml_backend)
+
+    def cache_namespace(self) -> str:
+        # Backends may resolve scalars differently, so their indexes are kept apart
+        return f"{super().cache_namespace()}/{self.yaml.name}"
+
+    def load_resources(self, content: str) -> Tuple[Any, Dict[str, dict]]:
+        # Handle multi-document YAML files
+        with run_stats.phase("parse.yaml"):
+            documents = self.yaml.load_all(content)
+
         resources = {}
         for doc in documents:
-            if not doc or not isinstance(doc, dict):
-                continue
-                
-            kind = doc.get('kind', '')
-            name = doc.get('metadata', {}).get('name', '')
-            namespace = doc.get('metadata', {}).get('namespace', 'default')
-            
-            if kind and name:
-                resource_id = f"{kind.lower()}.{namespace}.{name}"
+            resource_id = self.get_resource_id(doc)
+            if resource_id:
                 resources[resource_id] = doc
-                
-        return resources
-    
-    def add_tracking_label(self, file_path: Path, resource_id: str) -> bool:
-        with open(file_path, 'r') as f:
-            documents = list(yaml.safe_load_all(f))
-            
-        modified = False
-        for doc in documents:
-            if not doc or not isinstance(doc, dict):
+
+        return documents, resources
+
+    def get_resource_id(self, doc: Any) -> Optional[str]:
+        if not doc or not isinstance(doc, dict):
+            return None
+
+        kind = doc.get('kind', '')
+        name = doc.get('metadata', {}).get('name', '')
+        namespace = doc.get('metadata', {}).get('namespace', 'default')
+
+        if kind and name:
+            return f"{kind.lower()}.{namespace}.{name}"
+        return None
+
+    def get_tag(self, resource: dict) -> Optional[str]:
+        labels = (resource.get('metadata') or {}).get('labels')
+        return labels.get(self.LABEL_KEY) if isinstance(labels, dict) else None
+
+    def iter_documents(self, content: str) -> Iterator[Tuple[yaml.Node, Any]]:
+        """Lazily yield (node, data) per document, so only one document is held at a time"""
+        loader = self.yaml.loader(content)
+        try:
+            while True:
+                with run_stats.phase("parse.yaml"):
+                    if not loader.check_node():
+                        break
+                    node = loader.get_node()
+                    data = loader.construct_document(node)
+                yield node, data
+        finally:
+            loader.dispose()
+
+    def index_content(self, content: str) -> Dict[str, dict]:
+        index = {}
+        first_break = content.find('\n')
+        newline = '\r\n' if first_break > 0 and content[first_break - 1] == '\r' else '\n'
+        for node, doc in self.iter_documents(content):
+            resource_id = self.get_resource_id(doc)
+            if not resource_id:
                 continue
-                
-            kind = doc.get('kind', '')
-            name = doc.get('metadata', {}).get('name', '')
-            namespace = doc.get('metadata', {}).get('namespace', 'default')
-            current_resource_id = f"{kind.lower()}.{namespace}.{name}"
-            
-            if current_resource_id == resource_id:
-                current_hash = self.generate_resource_hash(str(doc))
-                commit_hash = self.get_last_commit(file_path)
-                new_label = f"{resource_id}:{current_hash}:{commit_hash}"
-                
-                # Initialize metadata and labels if they don't exist
-                if 'metadata' not in doc:
-                    doc['metadata'] = {}
-                if 'labels' not in doc['metadata']:
-                    doc['metadata']['labels'] = {}
-                
-                # Check if label already exists and is current
-                existing_label = doc['metadata']['labels'].get(self.LABEL_KEY)
-                if existing_label != new_label:
-                    doc['metadata']['labels'][self.LABEL_KEY] = new_label
-                    modified = True
-        
-        if modified:
-            # Write back to file while preserving formatting
-            with open(file_path, 'w') as f:
-                yaml.dump_all(documents, f, default_flow_style=False, sort_keys=False)
-                
-        return modified
-    
+            with run_stats.phase("hash"):
+                resource_hash = canonical_hash(doc, self.TAG_KEY)
+            index[resource_id] = {
+                "hash": resource_hash,
+                "tag": self.get_tag(doc),
+                "span": (node.start_mark.index, node.end_mark.index),
+                "edit": self.find_label_edit(content, node, newline),
+            }
+        return index
+
+    def find_label_edit(self, content: str, node: yaml.Node, newline: str = '\n') -> Optional[List]:
+        """
+        Locate where a document's tracking label goes.
+
+        Returns:
+            list: [start, end, before, after], meaning content[start:end] is
+            replaced by before + <label value> + after, or None if the document
+            has no metadata mapping to edit, or the mapping to edit is also
+            used elsewhere through a YAML alias (e.g. `selector: *labels`),
+            where the label would end up too.
+        """
+        metadata = self._mapping_value(node, 'metadata')
+        if not _is_node(metadata, 'mapping'):
+            return None
+        key = self.LABEL_KEY
+        # Aliases are rare, so the document is only searched for them when it has any
+        has_aliases = '*' in content[node.start_mark.index:node.end_mark.index]
+
+        labels_key, labels = self._mapping_item(metadata, 'labels')
+        if has_aliases and _aliased(node, labels if _is_node(labels, 'mapping') else metadata):
+            return None
+        if labels is None:
+            if metadata.flow_style or not metadata.value:
+                return self._flow_insert(metadata, f"labels: {{{key}: ", "}")
+            indent = ' ' * (metadata.value[0][0].start_mark.column + 2)
+            return self._block_insert(content, metadata, f"labels:{newline}{indent}{key}: ", newline)
+
+        if _is_node(labels, 'mapping'):
+            value = self._mapping_value(labels, key)
+            if value is not None:
+                return [value.start_mark.index, value.end_mark.index, "", ""]
+            if labels.flow_style or not labels.value:
+                return self._flow_insert(labels, f"{key}: ", "")
+            return self._block_insert(content, labels, f"{key}: ", newline)
+
+        if _is_node(labels, 'scalar') and str(labels.tag) == 'tag:yaml.org,2002:null':
+            # `labels:` with no value; put a flow mapping right after the colon
+            colon = content.index(':', labels_key.end_mark.index) + 1
+            if labels.start_mark.index == labels.end_mark.index:
+                return [colon, colon, f" {{{key}: ", "}"]
+            return [labels.start_mark.index, labels.end_mark.index, f"{{{key}: ", "}"]
+        return None
+
+    @staticmethod
+    def _mapping_item(node: yaml.Node, name: str) -> Tuple[Optional[yaml.Node], Optional[yaml.Node]]:
+        if _is_node(node, 'mapping'):
+            for key_node, value_node in node.value:
+                if _is_node(key_node, 'scalar') and key_node.value == name:
+                    return key_node, value_node
+        return None, None
+
+    def _mapping_value(self, node: yaml.Node, name: str) -> Optional[yaml.Node]:
+        return self._mapping_item(node, name)[1]
+
+    @staticmethod
+    def _flow_insert(mapping: yaml.MappingNode, before: str, after: str) -> List:
+        # The mapping ends right after its closing brace
+        closing = mapping.end_mark.index - 1
+        separator = ", " if mapping.value else ""
+        return [closing, closing, separator + before, after]
+
+    @staticmethod
+    def _block_insert(content: str, mapping: yaml.MappingNode, before: str, newline: str) -> List:
+        first_key = mapping.value[0][0]
+        indent = ' ' * first_key.start_mark.column
+        last_value = mapping.value[-1][1]
+        if _is_node(last_value, 'scalar') and last_value.start_mark.line == last_value.end_mark.line:
+            # Append a line after the last entry, past any trailing comment
+            line_end = content.find('\n', last_value.end_mark.index)
+            if line_end != -1:
+                return [line_end + 1, line_end + 1, indent + before, newline]
+            return [len(content), len(content), newline + indent + before, ""]
+        # Otherwise the last value spans several lines; go in front of the first key
+        start = first_key.start_mark.index
+        return [start, start, before, newline + indent]
+
+    def format_tag(self, value: str) -> str:
+        """Render a label value as a YAML scalar, quoted only when needed"""
+        with run_stats.phase("dump.yaml"):
+            return self.yaml.dump_scalar(value)
+
+    def add_tracking_label(self, file_path: Path, resource_id: str) -> bool:
+        return self.add_tracking_tags(file_path, [resource_id])
+
     def add_tracking_tag(self, file_path: Path, resource_id: str) -> bool:
         """Implement the abstract method but use add_tracking_label instead"""
-        return self.add_tracking_label(file_path, resource_id) 
\ No newline at end of file
+        return self.add_tracking_label(file_path, resource_id)
+
+
+def _aliased(root: yaml.Node, target: yaml.Node) -> bool:
+    """Whether target occurs more than once in the node graph of root, i.e. is also reached through an alias"""
+    found = 0
+    visited = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is target:
+            found += 1
+            if found > 1:
+                return True
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        if _is_node(node, 'mapping'):
+            for key_node, value_node in node.value:
+                stack.extend((key_node, value_node))
+        elif _is_node(node, 'sequence'):
+            stack.extend(node.value)
+    return False
+
+
+def _is_node(node: Any, node_id: str) -> bool:
+    # Compare node ids rather than classes, since ruamel has its own node types
+    return getattr(node, 'id', None) == node_id
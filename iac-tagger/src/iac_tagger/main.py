@@ -1,71 +1,640 @@
 import argparse
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+import warnings
+from collections import deque
 from pathlib import Path
-from typing import Dict, Type, List, Iterator, Optional
-from iac_tagger.iac_parser import IaCParser
-from iac_tagger.terraform_parser import TerraformParser
-from iac_tagger.kubernetes_parser import KubernetesParser
+from typing import Any, BinaryIO, Dict, Iterable, List, Iterator, Optional, Tuple, Union
+from iac_tagger.iac_parser import ATTRIBUTIONS, CHECK_STATUSES, DRIFT_STATUSES, IaCParser
+from iac_tagger.git_history import CommitResolver
+from iac_tagger.cache import MemoryCache, ResourceCache
+from iac_tagger.yaml_backend import BACKENDS as YAML_BACKENDS
+from iac_tagger.stats import REPORT_FORMATS, run_stats
+from iac_tagger.scanner import filter_ignored, scan_files
+from iac_tagger.daemon import default_socket_path, request as daemon_request
+from iac_tagger.inventory import LOOKUP_FIELDS, Inventory, default_inventory_path
+from iac_tagger.writeback import WriteBack
+from iac_tagger.sharding import ShardPlan, file_record, load_report, merge_reports, parse_shard
+
+# Most files handed to a worker process at once
+MAX_BATCH = 16
+
+# Paths of a file list that are grouped by parser and resolved against git together
+LIST_WINDOW = 1024
+
+# Parser of each supported extension. Parsers are imported and created on the
+# first file of their type (see IaCTagger.get_parser_for_extension), so a run
+# over YAML files never loads the HCL grammar and vice versa
+PARSER_NAMES: Dict[str, str] = {
+    '.tf': 'terraform',
+    '.yaml': 'kubernetes',
+    '.yml': 'kubernetes',
+}
 
 class IaCTagger:
-    def __init__(self):
-        self.parsers: Dict[str, Type[IaCParser]] = {
-            '.tf': TerraformParser(),
-            '.yaml': KubernetesParser(),
-            '.yml': KubernetesParser(),
-        }
-        
+    def __init__(self, commit_resolver: Optional[CommitResolver] = None,
+                 resource_cache: Optional[ResourceCache] = None,
+                 yaml_backend: str = "auto", attribution: str = "file",
+                 inventory: Optional[Inventory] = None):
+        if attribution not in ATTRIBUTIONS:
+            raise ValueError(f"Unknown attribution {attribution!r}, expected one of: {', '.join(ATTRIBUTIONS)}")
+        # One history walk serves the commit lookups of every parser
+        self.commit_resolver = commit_resolver or CommitResolver()
+        self.resource_cache = resource_cache
+        self.yaml_backend = yaml_backend
+        self.attribution = attribution
+        # Optional Inventory updated with the resources of every file tagged
+        self.inventory = inventory
+        # Writes are synced together at the end of each run (see flush_writes)
+        self.writeback = WriteBack()
+        # One instance per parser name, shared by its extensions
+        self.parsers: Dict[str, IaCParser] = {}
+
     def process_file(self, file_path: str) -> bool:
+        return self.tag_file(file_path)[0]
+
+    def tag_file(self, file_path: str) -> Tuple[bool, int]:
+        """Like process_file, returning (was_modified, number of resources in the file)"""
         path = Path(file_path)
-        if not path.exists():
-            raise FileNotFoundError(f"File {file_path} not found")
+        parser = self._require_parser(path)
             
+        # Parse once and write once, however many resources the file holds
+        with run_stats.file(path):
+            modified, resources = parser.tag_file(path)
+        if modified:
+            run_stats.count("files_modified")
+        return modified, resources
+
+    def check_file(self, file_path: str) -> Dict[str, str]:
+        """
+        Check the tracking tags of a file without writing to it.
+        Returns {resource_id: "current" | "stale" | "missing" | "untaggable"}.
+        """
+        path = Path(file_path)
+        parser = self._require_parser(path)
+        with run_stats.file(path):
+            return parser.check_tags(path)
+
+    def _require_parser(self, path: Path) -> IaCParser:
+        if not path.exists():
+            raise FileNotFoundError(f"File {path} not found")
         parser = self._get_parser(path)
         if not parser:
             raise ValueError(f"No parser found for file type: {path.suffix}")
-            
-        resources = parser.get_resources(path)
-        modified = False
-        
-        for resource_id in resources:
-            if parser.add_tracking_tag(path, resource_id):
-                modified = True
-                
-        return modified
+        return parser
     
     def _get_parser(self, file_path: Path) -> Optional[IaCParser]:
-        for suffix, parser in self.parsers.items():
-            if str(file_path).endswith(suffix):
-                return parser
+        name = str(file_path)
+        for extension in PARSER_NAMES:
+            if name.endswith(extension):
+                return self.get_parser_for_extension(extension)
         return None
+
+    def get_parser_for_extension(self, extension: str) -> IaCParser:
+        """Return the parser of a supported extension, creating it on first use"""
+        name = PARSER_NAMES[extension]
+        parser = self.parsers.get(name)
+        if parser is None:
+            parser = self.parsers[name] = self._create_parser(name)
+            parser.attribution = self.attribution
+            parser.inventory = self.inventory
+            parser.writeback = self.writeback
+        return parser
+
+    def _create_parser(self, name: str) -> IaCParser:
+        # Imported here rather than at the top, as hcl2/Lark and PyYAML dominate start-up time
+        if name == 'terraform':
+            from iac_tagger.terraform_parser import TerraformParser
+            return TerraformParser(self.commit_resolver, self.resource_cache)
+        if name == 'kubernetes':
+            from iac_tagger.kubernetes_parser import KubernetesParser
+            return KubernetesParser(self.commit_resolver, self.resource_cache, self.yaml_backend)
+        raise ValueError(f"Unknown parser: {name}")
     
+    def flush_writes(self) -> None:
+        """
+        Make the renames of the files written so far durable, syncing each
+        of their directories once (file data is synced as it is written).
+        Runs over directories and file lists do this when they finish, and
+        close() does it for process_file calls.
+        """
+        self.writeback.flush()
+
+    def close(self) -> None:
+        """Sync pending writes, stop any pending git walk and flush the resource cache"""
+        self.flush_writes()
+        self.commit_resolver.close()
+        if self.resource_cache is not None:
+            self.resource_cache.close()
+        if self.inventory is not None:
+            self.inventory.close()
+
     def get_supported_extensions(self) -> List[str]:
         """Return list of supported file extensions"""
-        return list(self.parsers.keys())
+        return list(PARSER_NAMES)
     
-    def process_directory(self, directory_path: str, recursive: bool = False) -> Dict[str, bool]:
+    def find_files(self, directory_path: str, recursive: bool = False,
+                   since: Optional[str] = None) -> List[Path]:
+        """Return supported files in a directory, in a stable order (see iter_files)"""
+        return list(self.iter_files(directory_path, recursive, since))
+
+    def iter_files(self, directory_path: str, recursive: bool = False,
+                   since: Optional[str] = None) -> Iterator[Path]:
+        """
+        Lazily yield supported files in a directory, in a stable order.
+
+        The tree is walked once for all extensions, skipping .git, .terraform,
+        node_modules and whatever .gitignore/.iactaggerignore exclude. With
+        since, only files changed since that git revision are returned,
+        taken straight from git instead of walking the tree.
+        """
+        if since:
+            changed = self._find_changed_files(Path(directory_path), recursive, since)
+            return filter_ignored(directory_path, changed)
+        return scan_files(directory_path, self.get_supported_extensions(), recursive)
+
+    def _find_changed_files(self, path: Path, recursive: bool, since: str) -> List[Path]:
+        root = Path(os.path.realpath(path))
+        by_ext: Dict[str, List[Path]] = {ext: [] for ext in self.get_supported_extensions()}
+        for changed in self.commit_resolver.changed_since(path, since):
+            try:
+                rel_path = changed.relative_to(root)
+            except ValueError:
+                continue
+            if not recursive and len(rel_path.parts) > 1:
+                continue
+            for ext in by_ext:
+                if changed.name.endswith(ext):
+                    by_ext[ext].append(path / rel_path)
+                    break
+        return [file_path for ext in by_ext for file_path in sorted(by_ext[ext])]
+
+    def process_directory(self, directory_path: str, recursive: bool = False, jobs: int = 1,
+                          since: Optional[str] = None,
+                          shard: Optional[Tuple[int, int]] = None) -> Dict[str, Union[bool, str]]:
         """
         Process all supported files in a directory
         Returns dict of {filepath: was_modified}
+
+        With jobs > 1 the files are tagged by a pool of worker processes;
+        jobs=0 uses one worker per CPU. With since, files unchanged since
+        that git revision are skipped without being opened. With shard=(i, n),
+        only the files of shard i of n are processed (see plan_shards).
+        """
+        return dict(self.iter_process_directory(directory_path, recursive, jobs, since, shard=shard))
+
+    def check_directory(self, directory_path: str, recursive: bool = False, jobs: int = 1,
+                        since: Optional[str] = None,
+                        shard: Optional[Tuple[int, int]] = None) -> Dict[str, Union[Dict[str, str], str]]:
+        """
+        Check the tracking tags of all supported files in a directory, read-only.
+        Returns dict of {filepath: {resource_id: status}} (see check_file)
+        """
+        return dict(self.iter_process_directory(directory_path, recursive, jobs, since, check=True, shard=shard))
+
+    def iter_process_directory(self, directory_path: str, recursive: bool = False, jobs: int = 1,
+                               since: Optional[str] = None, check: bool = False,
+                               shard: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Like process_directory, but yield (filepath, result) pairs while the tree is still being walked.
+        Once all results are consumed, the inventory (if any) is pruned, see prune_inventory.
+        """
+        discovered = None
+        if shard is not None:
+            index, count = shard
+            plan = self.plan_shards(directory_path, count, recursive, since)
+            file_paths = plan.files(index)
+            # Every shard knows the whole listing, so any of them can prune
+            discovered = list(plan.paths.values())
+        else:
+            path = Path(directory_path)
+            if not path.is_dir():
+                raise NotADirectoryError(f"{directory_path} is not a directory")
+            file_paths = run_stats.timed_iter("discover", self.iter_files(directory_path, recursive, since))
+        results = self.iter_process_files(file_paths, jobs, check)
+        if self.inventory is None or check:
+            return results
+        return self._pruning_inventory(results, directory_path, recursive, since, discovered)
+
+    def _pruning_inventory(self, results: Iterator[Tuple[str, Any]], directory_path: str, recursive: bool,
+                           since: Optional[str], discovered: Optional[List[Path]]) -> Iterator[Tuple[str, Any]]:
+        seen = []
+        for file_path, result in results:
+            seen.append(file_path)
+            yield file_path, result
+        self.prune_inventory(directory_path, seen if discovered is None else discovered, recursive, since)
+
+    def prune_inventory(self, directory_path: str, discovered: Iterable[Union[str, Path]],
+                        recursive: bool = False, since: Optional[str] = None) -> None:
+        """
+        Drop the inventory rows of files that a run over directory_path found
+        gone: with since, the files deleted since that revision; otherwise
+        every file under the directory that is not among the discovered
+        ones (deleted, moved or newly ignored).
+        """
+        with run_stats.phase("inventory"):
+            if since:
+                self.inventory.remove_files(self.commit_resolver.deleted_since(Path(directory_path), since))
+            else:
+                self.inventory.prune(directory_path, discovered, recursive)
+
+    def plan_shards(self, directory_path: str, count: int, recursive: bool = False,
+                    since: Optional[str] = None) -> ShardPlan:
+        """
+        Split the supported files of a directory into count shards, e.g. one
+        per CI runner. Every runner of the same checkout computes the same
+        plan, with shards balanced by committed file size (see sharding.ShardPlan).
+        """
+        if not Path(directory_path).is_dir():
+            raise NotADirectoryError(f"{directory_path} is not a directory")
+        # The whole listing is needed to balance the shards, so it is not streamed
+        with run_stats.phase("discover"):
+            return ShardPlan(directory_path, self.iter_files(directory_path, recursive, since), count,
+                             self.commit_resolver.blobs(Path(directory_path)))
+
+    async def process_directory_async(self, directory_path: str, recursive: bool = False,
+                                      since: Optional[str] = None, concurrency: Optional[int] = None,
+                                      check: bool = False) -> Dict[str, Any]:
+        """
+        Process all supported files in a directory with the asyncio engine.
+
+        Reads, commit lookups, parsing and writes of up to concurrency files
+        overlap, which pays off when file I/O has high latency (concurrency
+        defaults to pipeline.DEFAULT_CONCURRENCY). Returns the
+        same {filepath: was_modified} dict as process_directory, or with
+        check the read-only results of check_directory.
         """
         path = Path(directory_path)
         if not path.is_dir():
             raise NotADirectoryError(f"{directory_path} is not a directory")
-            
-        results = {}
-        
-        # Get all files with supported extensions
-        pattern = "**/*" if recursive else "*"
-        for ext in self.get_supported_extensions():
-            for file_path in path.glob(f"{pattern}{ext}"):
-                try:
-                    results[str(file_path)] = self.process_file(str(file_path))
-                except Exception as e:
-                    results[str(file_path)] = f"Error: {str(e)}"
-                    
+        file_paths = self.iter_files(directory_path, recursive, since)
+        results = await self.process_files_async(file_paths, concurrency, check)
+        if self.inventory is not None and not check:
+            self.prune_inventory(directory_path, results, recursive, since)
         return results
 
+    async def process_files_async(self, file_paths: Iterable[Path], concurrency: Optional[int] = None,
+                                  check: bool = False) -> Dict[str, Any]:
+        """Async counterpart of process_files; file_paths may be a lazy iterator"""
+        from iac_tagger.pipeline import DEFAULT_CONCURRENCY, AsyncPipeline
+
+        return await AsyncPipeline(self, concurrency or DEFAULT_CONCURRENCY, check).run(file_paths)
+
+    def iter_process_file_list(self, file_paths: Iterable[Union[str, Path]], jobs: int = 1,
+                               check: bool = False) -> Iterator[Tuple[str, Any]]:
+        """
+        Like iter_process_files, for long lists of paths such as the changed files of a CI job.
+
+        file_paths is consumed lazily, LIST_WINDOW paths at a time, and
+        results come in the order of prepare_file_list.
+        """
+        return self.iter_process_files(self.prepare_file_list(file_paths), jobs, check)
+
+    def prepare_file_list(self, file_paths: Iterable[Union[str, Path]]) -> Iterator[Path]:
+        """
+        Lazily dedupe and order a list of paths for processing.
+
+        Repeated paths (also when spelled differently or through symlinks)
+        and files of unsupported types are dropped. Within each window of
+        LIST_WINDOW paths, files are grouped by parser, and the last commits
+        of the whole window are looked up in one pass over the git history.
+        """
+        seen = set()
+        names = list(dict.fromkeys(PARSER_NAMES.values()))
+        file_paths = iter(file_paths)
+        while True:
+            chunk = list(itertools.islice(file_paths, LIST_WINDOW))
+            if not chunk:
+                return
+            groups: Dict[str, List[Path]] = {name: [] for name in names}
+            for file_path in map(Path, chunk):
+                name = next((PARSER_NAMES[extension] for extension in PARSER_NAMES
+                             if file_path.name.endswith(extension)), None)
+                key = os.path.realpath(file_path)
+                if name is None or key in seen:
+                    continue
+                seen.add(key)
+                groups[name].append(file_path)
+            window = [file_path for name in names for file_path in groups[name]]
+            if not window:
+                continue
+            if self.attribution == "file":
+                with run_stats.phase("commit"):
+                    self.commit_resolver.commits.update(self.commit_resolver.resolve(window))
+            yield from window
+
+    def process_files(self, file_paths: Iterable[Path], jobs: int = 1) -> Dict[str, Union[bool, str]]:
+        """
+        Process files, capturing per-file errors as "Error: ..." strings.
+        Results keep the order of file_paths whatever the number of jobs.
+        """
+        return dict(self.iter_process_files(file_paths, jobs))
+
+    def iter_process_files(self, file_paths: Iterable[Path], jobs: int = 1, check: bool = False,
+                           detailed: bool = False) -> Iterator[Tuple[str, Any]]:
+        """
+        Lazily process files, yielding (filepath, result) pairs in the order of file_paths.
+
+        file_paths may be a generator: with jobs > 1, files are handed to the
+        worker processes in small batches as soon as they come in, so tagging
+        starts before the listing is complete. With check, files are only
+        checked (see check_file) and never written. With detailed, each
+        result comes as (result, record), record being the file's entry of a
+        shard report (see sharding.file_record).
+        """
+        jobs = jobs or os.cpu_count() or 1
+        file_paths = iter(file_paths)
+        lookahead = list(itertools.islice(file_paths, jobs * 4 * MAX_BATCH))
+        if jobs == 1 or len(lookahead) < 2:
+            for file_path in itertools.chain(lookahead, file_paths):
+                yield str(file_path), _process_safely(self, file_path, check, detailed)
+            self.flush_writes()
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Short listings are split evenly; long ones go out MAX_BATCH files at a time
+        batch_size = max(1, min(MAX_BATCH, len(lookahead) // (jobs * 4)))
+        jobs = min(jobs, len(lookahead))
+        cache_dir = None
+        # Probed here, so an unusable cache is reported once rather than by every worker
+        if self.resource_cache is not None and self.resource_cache.usable():
+            cache_dir = str(self.resource_cache.cache_dir)
+        cache_read_only = self.resource_cache.read_only if self.resource_cache else False
+        inventory_path = str(self.inventory.db_path) if self.inventory else None
+        inventory_root = self.inventory.root if self.inventory else None
+        remaining = itertools.chain(lookahead, file_paths)
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(cache_dir, self.yaml_backend, self.attribution,
+                                           inventory_path, run_stats.enabled, cache_read_only,
+                                           inventory_root)) as executor:
+            while True:
+                batch = list(itertools.islice(remaining, batch_size))
+                if batch:
+                    commits = {}
+                    if self.attribution == "file":
+                        # Walk the git history once here rather than once per worker; blame
+                        # needs each file's content, so with resource attribution workers run it
+                        with run_stats.phase("commit"):
+                            commits = self.commit_resolver.resolve(batch)
+                    pending.append((batch, executor.submit(_process_batch_in_worker, batch, commits, check,
+                                                                  detailed)))
+                # Keep every worker busy without running ahead of the consumer
+                while pending and (not batch or len(pending) > jobs * 2):
+                    done_batch, future = pending.popleft()
+                    results, stats = future.result()
+                    run_stats.merge(stats)
+                    yield from zip(map(str, done_batch), results)
+                if not batch:
+                    return
+
+
+def _process_safely(tagger: IaCTagger, file_path: Path, check: bool = False, detailed: bool = False) -> Any:
+    start = time.perf_counter()
+    resources = None
+    try:
+        if check:
+            result = tagger.check_file(str(file_path))
+            resources = len(result)
+        elif detailed:
+            result, resources = tagger.tag_file(str(file_path))
+        else:
+            result = tagger.process_file(str(file_path))
+    except Exception as e:
+        run_stats.count("errors")
+        result = f"Error: {str(e)}"
+    if detailed:
+        return result, file_record(result, time.perf_counter() - start, resources)
+    return result
+
+
+# Each worker process owns a tagger, and with it its own parser instances
+_worker_tagger: Optional[IaCTagger] = None
+
+
+def _init_worker(cache_dir: Optional[str], yaml_backend: str, attribution: str = "file",
+                 inventory_path: Optional[str] = None, stats: bool = False,
+                 cache_read_only: bool = False, inventory_root: Optional[str] = None) -> None:
+    global _worker_tagger
+    if stats:
+        run_stats.enable()
+    resource_cache = ResourceCache(cache_dir, read_only=cache_read_only) if cache_dir else None
+    inventory = Inventory(inventory_path, inventory_root) if inventory_path else None
+    _worker_tagger = IaCTagger(CommitResolver(), resource_cache, yaml_backend, attribution, inventory)
+
+
+def _process_batch_in_worker(file_paths: List[Path], commits: Dict[str, str], check: bool = False,
+                             detailed: bool = False) -> Tuple[List[Any], Optional[dict]]:
+    # Commits come pre-resolved by the parent; the batch's figures ship back with the results
+    _worker_tagger.commit_resolver.commits.update(commits)
+    results = [_process_safely(_worker_tagger, file_path, check, detailed) for file_path in file_paths]
+    # Workers are never closed, so each batch syncs its own writes before reporting back
+    _worker_tagger.flush_writes()
+    if _worker_tagger.resource_cache is not None:
+        _worker_tagger.resource_cache.flush()
+    return results, run_stats.drain()
+
+def _iter_file_list(stream: BinaryIO, null: bool = False) -> Iterator[str]:
+    """
+    Lazily read paths from a binary stream: one per line, or with null
+    NUL-terminated, as printed by `git diff -z` or `find -print0`
+    """
+    if not null:
+        for line in stream:
+            path = line.rstrip(b'\r\n')
+            if path:
+                yield os.fsdecode(path)
+        return
+    buffer = b''
+    while True:
+        chunk = stream.read(65536)
+        if not chunk:
+            break
+        buffer += chunk
+        *paths, buffer = buffer.split(b'\0')
+        for path in paths:
+            if path:
+                yield os.fsdecode(path)
+    if buffer:
+        yield os.fsdecode(buffer)
+
+
+def _load_state(state_file: str) -> dict:
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(state_file: str, state: dict) -> None:
+    with open(state_file, 'w') as f:
+        json.dump(state, f)
+
+
+def _print_result(file_path: str, result: Union[bool, str], jsonl: bool, verbose: bool) -> None:
+    if jsonl:
+        record = {"file": file_path}
+        if isinstance(result, bool):
+            record["status"] = "modified" if result else "unchanged"
+        else:
+            record["status"] = "error"
+            record["error"] = result[len("Error: "):] if result.startswith("Error: ") else result
+        print(json.dumps(record), flush=True)
+    elif verbose or isinstance(result, str):  # Always show errors
+        if isinstance(result, bool):
+            status = "modified" if result else "unchanged"
+        else:
+            status = result  # This is an error message
+        print(f"File {file_path}: {status}", flush=True)
+
+
+def _print_check_result(file_path: str, result: Union[Dict[str, str], str], jsonl: bool,
+                        verbose: bool, totals: Dict[str, int]) -> None:
+    """Print the outcome of checking one file and add it to totals"""
+    if isinstance(result, str):
+        totals["errors"] += 1
+        _print_result(file_path, result, jsonl, verbose)
+        return
+
+    for status in result.values():
+        totals[status] += 1
+    drift = {resource_id: status for resource_id, status in result.items() if status in DRIFT_STATUSES}
+    if jsonl:
+        record = {"file": file_path, "status": "drift" if drift else "current", "resources": result}
+        print(json.dumps(record), flush=True)
+    elif drift or verbose:
+        counts = [f"{sum(1 for s in result.values() if s == status)} {status}"
+                  for status in CHECK_STATUSES if status in result.values()]
+        print(f"File {file_path}: {', '.join(counts) or 'no resources'}", flush=True)
+        for resource_id, status in result.items():
+            if verbose or status != "current":
+                print(f"  {status}: {resource_id}")
+
+
+def _finish_check(totals: Dict[str, int], jsonl: bool) -> None:
+    """Print the summary of a check and exit with status 1 on drift or errors"""
+    if not jsonl:
+        print(f"{totals['current']} current, {totals['stale']} stale, {totals['missing']} missing"
+              + (f", {totals['untaggable']} untaggable" if totals['untaggable'] else "")
+              + (f", {totals['errors']} errors" if totals['errors'] else ""))
+    if totals["stale"] or totals["missing"] or totals["errors"]:
+        exit(1)
+
+
+def _write_report(report_file: Optional[str], report: str) -> None:
+    if not report_file:
+        print(report)
+        return
+    # Replace atomically so collectors such as node_exporter never see a partial file
+    tmp_path = f"{report_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(report if report.endswith('\n') else report + '\n')
+    os.replace(tmp_path, report_file)
+
+
+def lookup_main(argv: List[str]) -> None:
+    """`iac-tagger lookup`: find resources in the inventory, e.g. by a tag seen on a cloud resource"""
+    parser = argparse.ArgumentParser(
+        prog="iac-tagger lookup",
+        description="Find where resources are defined, using the inventory kept by --inventory runs"
+    )
+    parser.add_argument("value", help="Tracking tag value to look up (or a resource ID, hash or commit, see --by)")
+    parser.add_argument(
+        "--by",
+        choices=LOOKUP_FIELDS,
+        default="tag",
+        help="What value is (default: tag); commits may be abbreviated"
+    )
+    parser.add_argument(
+        "--inventory",
+        metavar="PATH",
+        help=f"Inventory database (default: {default_inventory_path('<cache-dir>')})"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=ResourceCache.DEFAULT_DIR,
+        help=f"Cache directory holding the default inventory (default: {ResourceCache.DEFAULT_DIR})"
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Print one JSON object per resource"
+    )
+    args = parser.parse_args(argv)
+
+    inventory = Inventory(args.inventory or default_inventory_path(args.cache_dir))
+    try:
+        matches = inventory.lookup(args.value, args.by)
+    finally:
+        inventory.close()
+    for match in matches:
+        if args.jsonl:
+            print(json.dumps(match))
+            continue
+        location = match["path"]
+        if match["start_line"] is not None:
+            location += f":{match['start_line']}-{match['end_line']}"
+        print(f"{location}  {match['resource_id']}  {match['tag'] or '(untagged)'}")
+    if not matches:
+        exit(1)
+
+
+def merge_reports_main(argv: List[str]) -> None:
+    """`iac-tagger merge-reports`: combine the --report files of the shards of a run"""
+    parser = argparse.ArgumentParser(
+        prog="iac-tagger merge-reports",
+        description="Combine the reports written by `iac-tagger -d ... --shard I/N --report FILE` and "
+                    "check that every file was processed by exactly one shard"
+    )
+    parser.add_argument("reports", nargs="+", metavar="REPORT", help="Report of each shard")
+    parser.add_argument(
+        "-o", "--output",
+        metavar="FILE",
+        help="Write the merged report (totals, problems and every file's entry) here as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        reports = [load_report(path) for path in args.reports]
+    except (OSError, ValueError, KeyError) as e:
+        parser.error(str(e))
+    merged = merge_reports(reports)
+    if args.output:
+        _write_report(args.output, json.dumps(merged, indent=2))
+
+    totals = ", ".join(f"{count} {status}" for status, count in merged["totals"].items())
+    print(f"{len(merged['files'])} of {merged['discovered']} files from {len(merged['reported_shards'])} of "
+          f"{merged['shards']} shards: {totals or 'nothing processed'}")
+    for problem in merged["problems"]:
+        print(f"  problem: {problem}")
+    for rel_path in merged["overlap"]:
+        print(f"  overlap: {rel_path}")
+    if merged["problems"]:
+        exit(1)
+
+
+# Commands other than tagging, by the first command-line argument
+SUBCOMMANDS = {
+    "lookup": lookup_main,
+    "merge-reports": merge_reports_main,
+}
+
+
 def main():
+    if sys.argv[1:2] and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
-        description="Add git commit tracking tags/labels to IaC files"
+        description="Add git commit tracking tags/labels to IaC files",
+        epilog="Run `iac-tagger lookup --help` to trace tags back to their source with the inventory, "
+               "and `iac-tagger merge-reports --help` to combine the reports of sharded runs."
     )
     
     # Create mutually exclusive group for files vs directory
@@ -79,6 +648,18 @@ def main():
         "-d", "--directory",
         help="Process all supported files in directory"
     )
+    input_group.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Read the paths to process from FILE, or from stdin with '-', one per line; "
+             "duplicates and unsupported files are skipped, the rest are processed like -d "
+             "(e.g. with --jobs) and reported as JSONL"
+    )
+    parser.add_argument(
+        "-z", "--null",
+        action="store_true",
+        help="With --files-from, paths are NUL-terminated, e.g. from `git diff -z` or `find -print0`"
+    )
     
     # Additional options
     parser.add_argument(
@@ -86,11 +667,130 @@ def main():
         action="store_true",
         help="Recursively process directories (only with -d option)"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for directory mode (0 = one per CPU)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        metavar="N",
+        help="Use the asyncio engine with up to N files in flight, overlapping reads, git lookups, "
+             f"parsing and writes; suits network file systems (only with -d option, e.g. 32)"
+    )
+    parser.add_argument(
+        "--since",
+        metavar="REV",
+        help="Only process files changed since this git revision (only with -d option)"
+    )
+    parser.add_argument(
+        "--state-file",
+        help="Remember the HEAD of each run here and only process files changed since the "
+             "previous run, or all files when that run's HEAD is not in the repository (only with -d option)"
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Only process shard I of N (1-based), e.g. one per CI runner: every runner discovers the "
+             "same files and splits them the same way, balanced by file size (only with -d option)"
+    )
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="Write a JSON report of the run (per-file status, timings and resource counts) for "
+             "`iac-tagger merge-reports` (only with -d option)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=ResourceCache.DEFAULT_DIR,
+        help=f"Where to cache parsed resources between runs (default: {ResourceCache.DEFAULT_DIR})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse every file from scratch and leave the resource cache untouched"
+    )
+    parser.add_argument(
+        "--yaml-backend",
+        choices=YAML_BACKENDS,
+        default="auto",
+        help="YAML implementation for Kubernetes manifests (default: auto, the libyaml C bindings if "
+             "installed, else pure Python; both hash alike). ruamel resolves YAML 1.2, so values such as "
+             "yes or 0644 hash differently under it and tags change when switching"
+    )
+    parser.add_argument(
+        "--attribution",
+        choices=ATTRIBUTIONS,
+        default="file",
+        help="Commit recorded in each tag: the last commit of the whole file (default), or with "
+             "resource the newest commit among the resource's own lines, found with git blame, so "
+             "editing one resource leaves the tags of the others alone"
+    )
+    parser.add_argument(
+        "--inventory",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="Record the tag, hash, commit, file and lines of every resource of the files processed in "
+             "this SQLite inventory, for `iac-tagger lookup`, by their path in the repository; rows of "
+             "other files are kept, except files a directory run finds deleted, and --check leaves "
+             "the inventory alone "
+             f"(default: {default_inventory_path('<cache-dir>')})"
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Stream one JSON object per file ({\"file\", \"status\", \"error\"}) as results come in"
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="table",
+        choices=REPORT_FORMATS,
+        help="Report per-phase timings, counts, bytes and the slowest files (default format: table)"
+    )
+    parser.add_argument(
+        "--stats-file",
+        help="Write the --stats report here instead of stdout, e.g. a node_exporter textfile"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Dump cProfile statistics of the run to FILE (workers started by --jobs are not profiled)"
+    )
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
         help="Enable verbose output"
     )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only verify tags, opening files read-only; report current, stale and missing "
+             "tags and exit with status 1 on drift"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running: tag everything once, then re-tag files as they change, with parsed "
+             "resources held in memory (only with -d option)"
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="With --watch, rescan the tree every second instead of using inotify"
+    )
+    parser.add_argument(
+        "--socket",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="With --watch, also take requests on this Unix socket; with -f, hand the files to the "
+             "daemon listening there, tagging in process if there is none "
+             f"(default: {default_socket_path('<cache-dir>')})"
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -98,29 +798,171 @@ def main():
     )
     
     args = parser.parse_args()
-    tagger = IaCTagger()
+    if args.null and not args.files_from:
+        parser.error("--null requires --files-from")
+    if args.files_from:
+        # Results of file lists feed other tools
+        args.jsonl = True
+    if args.concurrency is not None:
+        if args.jobs != 1:
+            parser.error("--concurrency and --jobs cannot be combined")
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1")
+        if args.files_from:
+            parser.error("--concurrency cannot be combined with --files-from")
+    if args.watch:
+        if not args.directory:
+            parser.error("--watch requires -d")
+        if args.check or args.jobs != 1 or args.concurrency is not None:
+            parser.error("--watch cannot be combined with --check, --jobs or --concurrency")
+    elif args.socket is not None and not args.files:
+        parser.error("--socket requires --watch or -f")
+    shard = None
+    if args.shard or args.report:
+        if not args.directory:
+            parser.error("--shard and --report require -d")
+        if args.watch or args.concurrency is not None:
+            parser.error("--shard and --report cannot be combined with --watch or --concurrency")
+        try:
+            shard = parse_shard(args.shard or "1/1")
+        except ValueError as e:
+            parser.error(str(e))
+    socket_path = None
+    if args.socket is not None:
+        socket_path = args.socket or default_socket_path(args.cache_dir)
+    if args.stats_file and not args.stats:
+        args.stats = "table"
+    if args.stats:
+        run_stats.enable()
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    totals = {status: 0 for status in CHECK_STATUSES}
+    totals["errors"] = 0
+    if args.files and socket_path and not args.dry_run:
+        # A running daemon has everything loaded already; without one, tag here
+        try:
+            daemon_results = daemon_request(socket_path, args.files, args.check)
+        except OSError:
+            daemon_results = None
+        if daemon_results is not None:
+            for file_path, result in daemon_results.items():
+                if args.check:
+                    _print_check_result(file_path, result, args.jsonl, args.verbose, totals)
+                else:
+                    _print_result(file_path, result, args.jsonl, args.verbose)
+            if args.check:
+                _finish_check(totals, args.jsonl)
+            return
+
+    # A check opens nothing for writing, the cache included
+    resource_cache = None if args.no_cache else ResourceCache(args.cache_dir, read_only=args.check)
+    if args.watch:
+        resource_cache = MemoryCache(resource_cache)
+    commit_resolver = CommitResolver()
+    inventory = None
+    if args.inventory is not None and not args.check:
+        # Rows name files by their path in the repository, the same from every checkout
+        base = args.directory or "."
+        inventory = Inventory(args.inventory or default_inventory_path(args.cache_dir),
+                              commit_resolver.work_tree(Path(base)) or base)
+    tagger = IaCTagger(commit_resolver, resource_cache=resource_cache, yaml_backend=args.yaml_backend,
+                       attribution=args.attribution, inventory=inventory)
     
     try:
         if args.directory:
+            since = args.since
+            if not since and args.state_file:
+                since = _load_state(args.state_file).get("head")
+                if since and not tagger.commit_resolver.has_commit(Path(args.directory), since):
+                    # e.g. a shallow CI clone, or a branch rewritten by a force-push
+                    warnings.warn(f"Commit {since} of {args.state_file} is not in the repository, "
+                                  f"processing all files")
+                    since = None
+
+            start = time.perf_counter()
+            plan = None
+            if shard is not None:
+                plan = tagger.plan_shards(args.directory, shard[1], args.recursive, since)
+
             if args.dry_run:
                 # Just show what files would be processed
-                path = Path(args.directory)
-                pattern = "**/*" if args.recursive else "*"
                 print(f"Would process the following files in {args.directory}:")
-                for ext in tagger.get_supported_extensions():
-                    for file_path in path.glob(f"{pattern}{ext}"):
-                        print(f"  {file_path}")
+                file_paths = plan.files(shard[0]) if plan else tagger.iter_files(args.directory,
+                                                                                  args.recursive, since)
+                for file_path in file_paths:
+                    print(f"  {file_path}")
+                return
+
+            if args.watch:
+                from iac_tagger.daemon import TagDaemon
+
+                daemon = TagDaemon(tagger, args.directory, args.recursive, socket_path, args.poll,
+                                   on_result=lambda path, result: _print_result(path, result, args.jsonl,
+                                                                                args.verbose))
+                # Let a plain `kill` clean up the socket like Ctrl-C does
+                signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+                try:
+                    daemon.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    daemon.close()
                 return
                 
-            results = tagger.process_directory(args.directory, args.recursive)
-            for file_path, result in results.items():
-                if args.verbose or isinstance(result, str):  # Always show errors
-                    if isinstance(result, bool):
-                        status = "modified" if result else "unchanged"
+            records: Dict[str, dict] = {}
+            if args.concurrency:
+                import asyncio
+
+                results = asyncio.run(tagger.process_directory_async(
+                    args.directory, args.recursive, since, args.concurrency, args.check)).items()
+            elif plan is not None:
+                results = tagger.iter_process_files(plan.files(shard[0]), args.jobs, args.check,
+                                                    detailed=True)
+            else:
+                results = tagger.iter_process_directory(args.directory, args.recursive, args.jobs, since,
+                                                        args.check)
+            for file_path, result in results:
+                if plan is not None:
+                    result, records[file_path] = result
+                if args.check:
+                    _print_check_result(file_path, result, args.jsonl, args.verbose, totals)
+                else:
+                    _print_result(file_path, result, args.jsonl, args.verbose)
+            if plan is not None and tagger.inventory is not None and not args.check:
+                tagger.prune_inventory(args.directory, plan.paths.values(), args.recursive, since)
+
+            if args.report:
+                report = plan.report(shard[0], records, args.check, time.perf_counter() - start)
+                _write_report(args.report, json.dumps(report, indent=2))
+
+            # A check changes nothing, so the next run must still start from the previous state
+            if args.state_file and not args.check:
+                _save_state(args.state_file, {"head": tagger.commit_resolver.head(args.directory)})
+
+        elif args.files_from:
+            stream = sys.stdin.buffer if args.files_from == '-' else open(args.files_from, 'rb')
+            try:
+                file_paths = _iter_file_list(stream, args.null)
+                if args.dry_run:
+                    print("Would process the following files:")
+                    for file_path in tagger.prepare_file_list(file_paths):
+                        print(f"  {file_path}")
+                    return
+
+                for file_path, result in tagger.iter_process_file_list(file_paths, args.jobs, args.check):
+                    if args.check:
+                        _print_check_result(file_path, result, True, args.verbose, totals)
                     else:
-                        status = result  # This is an error message
-                    print(f"File {file_path}: {status}")
-                    
+                        _print_result(file_path, result, True, args.verbose)
+            finally:
+                if stream is not sys.stdin.buffer:
+                    stream.close()
+
         else:  # Processing individual files
             if args.dry_run:
                 print("Would process the following files:")
@@ -129,6 +971,13 @@ def main():
                 return
                 
             for file_path in args.files:
+                if args.check:
+                    _print_check_result(file_path, _process_safely(tagger, file_path, True),
+                                        args.jsonl, args.verbose, totals)
+                    continue
+                if args.jsonl:
+                    _print_result(file_path, _process_safely(tagger, file_path), True, args.verbose)
+                    continue
                 try:
                     modified = tagger.process_file(file_path)
                     if args.verbose:
@@ -141,6 +990,19 @@ def main():
         print(f"Error: {e}")
         parser.print_help()
         exit(1)
+    finally:
+        # Reported once a manifest was met, since asking earlier would load PyYAML for every run
+        if args.verbose and not args.jsonl and "kubernetes" in tagger.parsers:
+            print(f"YAML backend: {tagger.parsers['kubernetes'].yaml.name}")
+        tagger.close()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.stats:
+            _write_report(args.stats_file, run_stats.report(args.stats))
+
+    if args.check:
+        _finish_check(totals, args.jsonl)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+Asyncio engine that overlaps the stages of tagging many files.
+
+Reads and writes run on an I/O thread pool, indexing (parsing and hashing)
+on a CPU thread pool and commit lookups on a single git thread, since the
+CommitResolver walks one history stream. At most `concurrency` files are in
+flight; the directory walk is paused while that many are pending, and
+finished contents queue up for writer tasks that hand them to the I/O pool
+in batches.
+
+This pays off where each read or write has real latency, such as
+network-mounted workspaces. Threads share the parsers and the resource
+cache, so for CPU-bound runs on local disks --jobs scales further.
+"""
+import asyncio
+import itertools
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+from iac_tagger.iac_parser import IaCParser
+from iac_tagger.stats import run_stats
+
+if TYPE_CHECKING:
+    from iac_tagger.main import IaCTagger
+
+DEFAULT_CONCURRENCY = 32
+# Files written per hand-off to the I/O pool
+WRITE_BATCH = 8
+# Paths pulled from the directory walk per hand-off
+WALK_BATCH = 64
+
+
+class AsyncPipeline:
+    def __init__(self, tagger: "IaCTagger", concurrency: int = DEFAULT_CONCURRENCY, check: bool = False):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.tagger = tagger
+        self.concurrency = concurrency
+        # Only compare tags (see IaCTagger.check_file); nothing is written
+        self.check = check
+
+    async def run(self, file_paths: Iterable[Path]) -> Dict[str, Any]:
+        """Tag file_paths, returning {filepath: was_modified or "Error: ..."} in input order"""
+        loop = asyncio.get_running_loop()
+        io_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="iac-tagger-io")
+        git_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iac-tagger-git")
+        cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="iac-tagger-cpu")
+        writes: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        writers = [asyncio.create_task(self._writer(loop, io_pool, writes))
+                   for _ in range(max(1, min(4, self.concurrency // WRITE_BATCH)))]
+        slots = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, Any] = {}
+        tasks: List[asyncio.Task] = []
+
+        async def process(file_path: Path) -> None:
+            try:
+                results[str(file_path)] = await self._process(loop, io_pool, cpu_pool, git_pool, writes, file_path)
+            except Exception as e:
+                run_stats.count("errors")
+                results[str(file_path)] = f"Error: {str(e)}"
+            finally:
+                slots.release()
+
+        try:
+            walk = iter(file_paths)
+            while True:
+                batch = await loop.run_in_executor(io_pool, _take, walk, WALK_BATCH)
+                if not batch:
+                    break
+                for file_path in batch:
+                    # Backpressure: the walk waits until a slot frees up
+                    await slots.acquire()
+                    results[str(file_path)] = None
+                    tasks.append(asyncio.create_task(process(file_path)))
+            await asyncio.gather(*tasks)
+            for _ in writers:
+                await writes.put(None)
+            await asyncio.gather(*writers)
+            # One round of fsyncs for everything written
+            await loop.run_in_executor(io_pool, self.tagger.flush_writes)
+        finally:
+            for task in itertools.chain(tasks, writers):
+                task.cancel()
+            for pool in (io_pool, git_pool, cpu_pool):
+                pool.shutdown(wait=True)
+        return results
+
+    async def _process(self, loop: asyncio.AbstractEventLoop, io_pool: Executor, cpu_pool: Executor,
+                       git_pool: Executor, writes: asyncio.Queue, file_path: Path) -> Any:
+        parser = self.tagger._get_parser(file_path)
+        if not parser:
+            raise ValueError(f"No parser found for file type: {file_path.suffix}")
+
+        with run_stats.file(file_path):
+            try:
+                content = await loop.run_in_executor(io_pool, parser.read_file, file_path)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"File {file_path} not found")
+
+            # Parse and look up the commits at the same time
+            index, found = await asyncio.gather(
+                loop.run_in_executor(cpu_pool, parser.index_resources, content),
+                loop.run_in_executor(git_pool, _lookup_commits, parser, file_path, content),
+            )
+            commit_hash = parser.attribute_commits(content, index, found)
+            if self.check:
+                return parser.check_index(index, commit_hash)
+            new_content = parser.retag_content(content, index, commit_hash) if index else None
+            modified = False
+            if new_content is not None:
+                written = loop.create_future()
+                await writes.put((parser, file_path, new_content, content, written))
+                modified = await written
+            if parser.inventory is not None:
+                await loop.run_in_executor(cpu_pool, parser.record_inventory, file_path,
+                                           new_content if modified else content)
+        if not modified:
+            return False
+        run_stats.count("files_modified")
+        return True
+
+    async def _writer(self, loop: asyncio.AbstractEventLoop, io_pool: Executor, writes: asyncio.Queue) -> None:
+        while True:
+            item = await writes.get()
+            if item is None:
+                return
+            batch = [item]
+            # Take whatever else is already waiting, up to a batch
+            while len(batch) < WRITE_BATCH and not writes.empty():
+                item = writes.get_nowait()
+                if item is None:
+                    # Put the stop marker back for after this batch
+                    writes.put_nowait(None)
+                    break
+                batch.append(item)
+            outcomes = await loop.run_in_executor(io_pool, _write_batch, [item[:4] for item in batch])
+            for item, outcome in zip(batch, outcomes):
+                if isinstance(outcome, Exception):
+                    item[4].set_exception(outcome)
+                else:
+                    item[4].set_result(outcome)
+
+
+def _take(iterator: Iterator[Path], count: int) -> List[Path]:
+    with run_stats.phase("discover"):
+        return list(itertools.islice(iterator, count))
+
+
+def _lookup_commits(parser: IaCParser, file_path: Path, content: str) -> Any:
+    with run_stats.phase("commit"):
+        return parser.lookup_commits(file_path, content)
+
+
+def _write_batch(batch: List[Tuple[IaCParser, Path, str, str]]) -> List[Union[bool, Exception]]:
+    """Write each (parser, path, new content, original content), returning whether it was written or the error"""
+    outcomes: List[Union[bool, Exception]] = []
+    for parser, file_path, content, original in batch:
+        try:
+            outcomes.append(parser.write_file(file_path, content, original))
+        except Exception as e:
+            outcomes.append(e)
+    return outcomes
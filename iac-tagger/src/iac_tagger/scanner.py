@@ -0,0 +1,218 @@
+"""
+Single-pass directory scanner.
+
+One os.scandir walk finds the files of every supported suffix at once,
+skipping vendored and tool directories and anything excluded by
+`.gitignore` or `.iactaggerignore` files, and yields paths as it goes.
+"""
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Never worth descending into: VCS metadata, provider caches, vendored packages
+PRUNED_DIRS = frozenset({".git", ".terraform", "node_modules", ".iac_tagger_cache"})
+
+IGNORE_FILES = (".gitignore", ".iactaggerignore")
+
+# (base, pattern, negated, directories_only): base is the posix path of the
+# ignore file's directory relative to the scan root ("" for the root itself)
+_Rule = Tuple[str, "re.Pattern", bool, bool]
+
+
+def _translate(pattern: str) -> str:
+    """Regex source for one gitignore glob, matched against a path relative to the ignore file"""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i) and (i == 0 or pattern[i - 1] == '/'):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i) and i + 2 == len(pattern) and (i == 0 or pattern[i - 1] == '/'):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                parts.append(re.escape('['))
+                i += 1
+                continue
+            body = pattern[i + 1:end].replace('\\', '\\\\')
+            if body[0] in '!^':
+                body = '^' + body[1:]
+            parts.append(f'[{body}]')
+            i = end + 1
+        elif pattern[i] == '\\' and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    prefix = '' if anchored else '(?:.*/)?'
+    return prefix + ''.join(parts) + r'\Z'
+
+
+def parse_ignore_file(path: str, base: str) -> List[_Rule]:
+    """Read the rules of one ignore file whose directory is base (relative to the scan root)"""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+
+    rules = []
+    for line in lines:
+        if not line.endswith('\\ '):
+            line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        elif line.startswith(('\\#', '\\!')):
+            line = line[1:]
+        directories_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+        rules.append((base, re.compile(_translate(line)), negated, directories_only))
+    return rules
+
+
+def is_ignored(rules: List[_Rule], rel_path: str, is_dir: bool) -> bool:
+    """Whether the last rule matching rel_path (posix, relative to the scan root) excludes it"""
+    for base, pattern, negated, directories_only in reversed(rules):
+        if directories_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + '/'):
+                continue
+            candidate = rel_path[len(base) + 1:]
+        else:
+            candidate = rel_path
+        if pattern.match(candidate):
+            return not negated
+    return False
+
+
+class _Rebased:
+    """Pattern of an ignore file above the scan root, matched as if from its own directory"""
+
+    def __init__(self, prefix: str, pattern: "re.Pattern"):
+        self.prefix = prefix + '/'
+        self.pattern = pattern
+
+    def match(self, rel_path: str):
+        return self.pattern.match(self.prefix + rel_path)
+
+
+def _ancestor_rules(root: str) -> List[_Rule]:
+    """Rules of ignore files between the enclosing git work tree and root, outermost first"""
+    directories = []
+    current = os.path.realpath(root)
+    while True:
+        directories.append(current)
+        if os.path.exists(os.path.join(current, '.git')):
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            # Not inside a work tree; only root's own ignore files apply
+            directories = directories[:1]
+            break
+        current = parent
+
+    rules: List[_Rule] = []
+    for directory in reversed(directories[1:]):
+        # Patterns of outer files are re-based onto root by matching from their own directory
+        prefix = os.path.relpath(os.path.realpath(root), directory).replace(os.sep, '/')
+        for name in IGNORE_FILES:
+            for base, pattern, negated, directories_only in parse_ignore_file(os.path.join(directory, name), ''):
+                rules.append((base, _Rebased(prefix, pattern), negated, directories_only))
+    return rules
+
+
+def scan_files(root: str, suffixes: Iterable[str], recursive: bool = True,
+               directories: bool = False) -> Iterator[Path]:
+    """
+    Lazily yield the files under root whose names end with one of suffixes.
+
+    The tree is walked once, directory by directory in name order, files of
+    a directory before its subdirectories. PRUNED_DIRS and everything that
+    `.gitignore`/`.iactaggerignore` rules exclude are skipped; symlinked
+    directories are not followed. With directories, every directory walked
+    (root included) is yielded too, ahead of its files.
+    """
+    suffixes = tuple(suffixes)
+    stack: List[Tuple[str, str, List[_Rule]]] = [(str(root), "", _ancestor_rules(root))]
+    while stack:
+        directory, rel_dir, rules = stack.pop()
+        for name in IGNORE_FILES:
+            rules = rules + parse_ignore_file(os.path.join(directory, name), rel_dir)
+        if directories:
+            yield Path(directory)
+
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and entry.name not in PRUNED_DIRS and not is_ignored(rules, rel_path, True):
+                        subdirectories.append((entry.path, rel_path, rules))
+                elif entry.name.endswith(suffixes) and entry.is_file() \
+                        and not is_ignored(rules, rel_path, False):
+                    yield Path(entry.path)
+            except OSError:
+                continue
+        # Reversed so the stack pops them in name order
+        stack.extend(reversed(subdirectories))
+
+
+def scan_directories(root: str, recursive: bool = True) -> Iterator[Path]:
+    """Lazily yield root and the directories under it that scan_files descends into"""
+    return scan_files(root, (), recursive, directories=True)
+
+
+def filter_ignored(root: str, paths: Iterable[Path]) -> Iterator[Path]:
+    """Drop paths under root that scan_files would skip, for file lists that come from elsewhere"""
+    root = os.path.realpath(root)
+    rules = _ancestor_rules(root)
+    for ignore_file in IGNORE_FILES:
+        rules = rules + parse_ignore_file(os.path.join(root, ignore_file), "")
+    rules_by_dir: Dict[str, Optional[List[_Rule]]] = {"": rules}
+
+    def rules_for(rel_dir: str) -> Optional[List[_Rule]]:
+        # None when rel_dir itself is pruned or ignored
+        if rel_dir not in rules_by_dir:
+            parent, _, name = rel_dir.rpartition('/')
+            parent_rules = rules_for(parent)
+            if parent_rules is None or name in PRUNED_DIRS or is_ignored(parent_rules, rel_dir, True):
+                rules_by_dir[rel_dir] = None
+            else:
+                rules = parent_rules
+                for ignore_file in IGNORE_FILES:
+                    rules = rules + parse_ignore_file(os.path.join(root, rel_dir, ignore_file), rel_dir)
+                rules_by_dir[rel_dir] = rules
+        return rules_by_dir[rel_dir]
+
+    for path in paths:
+        rel_path = os.path.relpath(os.path.realpath(path), root).replace(os.sep, '/')
+        if rel_path.startswith('../'):
+            yield path
+            continue
+        rules = rules_for(rel_path.rpartition('/')[0])
+        if rules is not None and not is_ignored(rules, rel_path, False):
+            yield path
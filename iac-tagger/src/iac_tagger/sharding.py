@@ -0,0 +1,194 @@
+"""
+Deterministic sharding of a tagging run across CI runners, and the reports
+that the shards write and merge-reports combines.
+
+Every runner discovers the same files and computes the same plan: files
+are placed largest first, each on the shard with the fewest bytes so far
+(ties broken by file count, then by a stable hash of the path relative to
+the tagged directory), so shards come out balanced by size and no file
+depends on where the checkout lives. Sizes are those of the blobs
+committed at HEAD rather than of the files on disk, which shards tagging
+the same workspace one after another or line-ending conversion would
+change; files not committed weigh nothing. Each shard writes a JSON report:
+
+    {"version": 1, "shard": 2, "shards": 4, "fingerprint": "...", "discovered": 1200,
+     "shard_files": [301, 299, 300, 300], "check": false, "wall_seconds": 12.5,
+     "files": {"modules/vpc/main.tf": {"status": "modified", "seconds": 0.012, "resources": 14}}}
+
+The fingerprint identifies the discovered file set and the blobs of its
+committed files, so merging can tell reports of different commits apart.
+"""
+import hashlib
+import heapq
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from iac_tagger.iac_parser import DRIFT_STATUSES
+
+REPORT_VERSION = 1
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse "I/N" (1-based shard I of N) into (I, N)"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}, expected I/N such as 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {spec!r}, expected 1 <= I <= N")
+    return index, count
+
+
+def _stable_hash(rel_path: str) -> int:
+    return int.from_bytes(hashlib.sha256(rel_path.encode("utf-8", "surrogateescape")).digest()[:8], "big")
+
+
+class ShardPlan:
+    """
+    Assignment of the files discovered under root to count shards, weighed
+    by blobs ({real_path: (blob id, size)}, see CommitResolver.blobs)
+    """
+
+    def __init__(self, root: str, file_paths: Iterable[Path], count: int,
+                 blobs: Optional[Dict[str, Tuple[str, int]]] = None):
+        if count < 1:
+            raise ValueError("shard count must be at least 1")
+        self.root = root
+        self.count = count
+        self.paths: Dict[str, Path] = {}
+        committed: Dict[str, Tuple[str, int]] = {}
+        for file_path in file_paths:
+            rel_path = relative_path(root, file_path)
+            self.paths[rel_path] = Path(file_path)
+            committed[rel_path] = (blobs or {}).get(os.path.realpath(file_path), ("", 0))
+
+        # Largest first onto the lightest shard; the hash keeps ties deterministic
+        order = sorted(committed, key=lambda rel_path: (-committed[rel_path][1], _stable_hash(rel_path), rel_path))
+        loads = [(0, 0, shard) for shard in range(1, count + 1)]
+        self.shards: Dict[int, List[str]] = {shard: [] for shard in range(1, count + 1)}
+        for rel_path in order:
+            load, files, shard = heapq.heappop(loads)
+            self.shards[shard].append(rel_path)
+            heapq.heappush(loads, (load + committed[rel_path][1], files + 1, shard))
+        for rel_paths in self.shards.values():
+            rel_paths.sort()
+
+        digest = hashlib.sha256()
+        for rel_path in sorted(committed):
+            digest.update(f"{rel_path}\0{committed[rel_path][0]}\0".encode("utf-8", "surrogateescape"))
+        self.fingerprint = digest.hexdigest()[:16]
+
+    def files(self, shard: int) -> List[Path]:
+        """Files of a 1-based shard, in path order"""
+        return [self.paths[rel_path] for rel_path in self.shards[shard]]
+
+    def report(self, shard: int, results: Dict[str, dict], check: bool = False,
+               wall_seconds: Optional[float] = None) -> dict:
+        """Report of a shard, from {file path: record} of its files"""
+        return {
+            "version": REPORT_VERSION,
+            "shard": shard,
+            "shards": self.count,
+            "fingerprint": self.fingerprint,
+            "discovered": len(self.paths),
+            "shard_files": [len(self.shards[index]) for index in range(1, self.count + 1)],
+            "check": check,
+            "wall_seconds": None if wall_seconds is None else round(wall_seconds, 6),
+            "files": {relative_path(self.root, file_path): record for file_path, record in results.items()},
+        }
+
+
+def relative_path(root: str, file_path) -> str:
+    """Posix path of file_path relative to root, the same on every runner"""
+    return Path(os.path.relpath(file_path, root)).as_posix()
+
+
+def file_record(result: Any, seconds: float, resources: Optional[int]) -> dict:
+    """Report entry of one file from its process_file / check_file result"""
+    if isinstance(result, str):
+        status = "error"
+    elif isinstance(result, dict):
+        status = "drift" if any(value in DRIFT_STATUSES for value in result.values()) else "current"
+    else:
+        status = "modified" if result else "unchanged"
+    record: Dict[str, Any] = {"status": status, "seconds": round(seconds, 6), "resources": resources}
+    if isinstance(result, str):
+        record["error"] = result[len("Error: "):] if result.startswith("Error: ") else result
+    elif isinstance(result, dict):
+        record["tags"] = {value: sum(1 for other in result.values() if other == value)
+                          for value in sorted(set(result.values()))}
+    return record
+
+
+def merge_reports(reports: List[dict]) -> dict:
+    """
+    Combine the reports of all shards of a run.
+
+    Returns:
+        dict: the merged "files", "totals" per status, the "problems" found
+        (reports of different file sets or shard counts, duplicate or
+        missing shards, shards that did not report all their files, files
+        reported by several shards) and the "overlap" paths.
+    """
+    problems: List[str] = []
+    if not reports:
+        return {"files": {}, "totals": {}, "problems": ["No reports given"], "overlap": []}
+
+    counts = {report["shards"] for report in reports}
+    fingerprints = {report["fingerprint"] for report in reports}
+    if len(counts) > 1:
+        problems.append(f"Reports disagree on the number of shards: {sorted(counts)}")
+    if len(fingerprints) > 1:
+        problems.append("Reports were made from different file sets (discovered files or commits differ)")
+
+    by_shard: Dict[int, dict] = {}
+    for report in reports:
+        if report["shard"] in by_shard:
+            problems.append(f"Shard {report['shard']}/{report['shards']} was reported more than once")
+        by_shard[report["shard"]] = report
+
+    count = max(counts)
+    for shard in range(1, count + 1):
+        if shard not in by_shard:
+            assigned = reports[0]["shard_files"]
+            files = f" ({assigned[shard - 1]} files)" if len(assigned) == count else ""
+            problems.append(f"Shard {shard}/{count} is missing{files}")
+
+    files: Dict[str, dict] = {}
+    owners: Dict[str, List[int]] = {}
+    for report in reports:
+        assigned = report["shard_files"][report["shard"] - 1]
+        if len(report["files"]) != assigned:
+            problems.append(f"Shard {report['shard']}/{report['shards']} reported "
+                            f"{len(report['files'])} of its {assigned} files")
+        for rel_path, record in report["files"].items():
+            owners.setdefault(rel_path, []).append(report["shard"])
+            files[rel_path] = record
+    overlap = sorted(rel_path for rel_path, shards in owners.items() if len(shards) > 1)
+    if overlap:
+        problems.append(f"{len(overlap)} files were reported by more than one shard")
+
+    totals: Dict[str, int] = {}
+    for record in files.values():
+        totals[record["status"]] = totals.get(record["status"], 0) + 1
+    return {
+        "shards": count,
+        "reported_shards": sorted(by_shard),
+        "fingerprint": next(iter(fingerprints)) if len(fingerprints) == 1 else None,
+        "discovered": reports[0]["discovered"],
+        "wall_seconds": max((report.get("wall_seconds") or 0) for report in reports),
+        "totals": dict(sorted(totals.items())),
+        "problems": problems,
+        "overlap": overlap,
+        "files": dict(sorted(files.items())),
+    }
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r") as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(f"{path} is not an iac-tagger shard report (version {REPORT_VERSION})")
+    return report
@@ -0,0 +1,246 @@
+"""
+Run statistics: per-phase wall time, call counts, bytes, counters and the
+slowest files of a tagging run.
+
+Recording is off by default and then costs one attribute check per phase.
+Code paths record into the process-wide `run_stats`, from any thread (e.g.
+the thread pool of the asyncio pipeline); worker processes hand their
+figures back with drain() and the parent folds them in with merge().
+"""
+import heapq
+import json
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+REPORT_FORMATS = ("table", "json", "prometheus")
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats: "RunStats", name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self) -> "_Phase":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+
+
+class _FileTimer:
+    __slots__ = ("stats", "path", "start")
+
+    def __init__(self, stats: "RunStats", path: str):
+        self.stats = stats
+        self.path = path
+
+    def __enter__(self) -> "_FileTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stats.add_file(self.path, time.perf_counter() - self.start)
+
+
+class RunStats:
+    """
+    Figures of one run.
+
+    Phases (e.g. "parse.hcl", "hash", "write") accumulate seconds, calls and
+    bytes; phases may nest, so their times do not add up to the wall time.
+    Counters are plain totals such as "subprocesses" or "cache_hits".
+    Figures are updated under a lock, so threads may record concurrently.
+    """
+
+    def __init__(self, slowest: int = 10):
+        self.enabled = False
+        self.slowest = slowest
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.phases: Dict[str, List[float]] = {}
+            self.counters: Dict[str, int] = {}
+            self.files: List[Tuple[float, str]] = []
+
+    def enable(self, slowest: Optional[int] = None) -> None:
+        """Start recording from a clean slate"""
+        if slowest is not None:
+            self.slowest = slowest
+        self.enabled = True
+        self.reset()
+
+    def phase(self, name: str):
+        """Context manager timing one call of a phase"""
+        return _Phase(self, name) if self.enabled else _NULL_PHASE
+
+    def file(self, path) -> object:
+        """Context manager timing the processing of one file"""
+        return _FileTimer(self, str(path)) if self.enabled else _NULL_PHASE
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """Pass iterable through, timing each step under a phase, e.g. a lazy directory walk"""
+        if not self.enabled:
+            return iter(iterable)
+        return self._timed_iter(name, iter(iterable))
+
+    def _timed_iter(self, name: str, iterator: Iterator) -> Iterator:
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _entry(self, name: str) -> List[float]:
+        entry = self.phases.get(name)
+        if entry is None:
+            # [seconds, calls, bytes]
+            entry = self.phases[name] = [0.0, 0, 0]
+        return entry
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._entry(name)
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add_bytes(self, name: str, nbytes: int) -> None:
+        if self.enabled:
+            with self._lock:
+                self._entry(name)[2] += nbytes
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_file(self, path: str, seconds: float) -> None:
+        with self._lock:
+            self.count("files")
+            self._add_slowest((seconds, path))
+
+    def _add_slowest(self, item: Tuple[float, str]) -> None:
+        if len(self.files) < self.slowest:
+            heapq.heappush(self.files, item)
+        elif self.files and item > self.files[0]:
+            heapq.heapreplace(self.files, item)
+
+    def snapshot(self) -> dict:
+        """JSON-serializable copy of the figures recorded so far"""
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "phases": {
+                name: {"seconds": round(seconds, 6), "calls": calls, "bytes": nbytes}
+                for name, (seconds, calls, nbytes) in sorted(self.phases.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_files": [
+                {"path": path, "seconds": round(seconds, 6)}
+                for seconds, path in sorted(self.files, reverse=True)
+            ],
+        }
+
+    def drain(self) -> Optional[dict]:
+        """Snapshot and clear the figures, e.g. to ship them out of a worker process"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            snapshot = self._snapshot()
+            self.reset()
+        return snapshot
+
+    def merge(self, snapshot: Optional[dict]) -> None:
+        """Fold a snapshot from another process into these figures"""
+        if not snapshot or not self.enabled:
+            return
+        with self._lock:
+            for name, phase in snapshot["phases"].items():
+                entry = self._entry(name)
+                entry[0] += phase["seconds"]
+                entry[1] += phase["calls"]
+                entry[2] += phase["bytes"]
+            for name, n in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            for item in snapshot["slowest_files"]:
+                self._add_slowest((item["seconds"], item["path"]))
+
+    def report(self, fmt: str = "table") -> str:
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format {fmt!r}, expected one of: {', '.join(REPORT_FORMATS)}")
+        snapshot = self.snapshot()
+        if fmt == "json":
+            return json.dumps(snapshot, indent=2)
+        if fmt == "prometheus":
+            return format_prometheus(snapshot)
+        return format_table(snapshot)
+
+
+def format_table(snapshot: dict) -> str:
+    lines = [f"Wall time: {snapshot['wall_seconds']:.3f}s", ""]
+    lines.append(f"{'phase':<16} {'seconds':>10} {'calls':>9} {'bytes':>12}")
+    phases = sorted(snapshot["phases"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for name, phase in phases:
+        nbytes = str(phase["bytes"]) if phase["bytes"] else "-"
+        lines.append(f"{name:<16} {phase['seconds']:>10.3f} {phase['calls']:>9} {nbytes:>12}")
+    if snapshot["counters"]:
+        lines.append("")
+        for name, n in snapshot["counters"].items():
+            lines.append(f"{name:<16} {n:>10}")
+    if snapshot["slowest_files"]:
+        lines.append("")
+        lines.append("Slowest files:")
+        for item in snapshot["slowest_files"]:
+            lines.append(f"  {item['seconds']:>8.3f}s  {item['path']}")
+    return "\n".join(lines)
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(snapshot: dict, prefix: str = "iac_tagger") -> str:
+    """Render a snapshot in the Prometheus text exposition format, e.g. for node_exporter's textfile collector"""
+    lines = [
+        f"# HELP {prefix}_run_seconds Wall time of the last run.",
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds {snapshot['wall_seconds']}",
+    ]
+    metrics = (("seconds", "Seconds spent per phase."),
+               ("calls", "Calls per phase."),
+               ("bytes", "Bytes handled per phase."))
+    for field, help_text in metrics:
+        name = f"{prefix}_phase_{field}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for phase, values in snapshot["phases"].items():
+            lines.append(f'{name}{{phase="{_label(phase)}"}} {values[field]}')
+    for counter, n in snapshot["counters"].items():
+        name = f"{prefix}_{counter}"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {n}")
+    if snapshot["slowest_files"]:
+        name = f"{prefix}_slowest_file_seconds"
+        lines.append(f"# HELP {name} Processing time of the slowest files.")
+        lines.append(f"# TYPE {name} gauge")
+        for item in snapshot["slowest_files"]:
+            lines.append(f'{name}{{path="{_label(item["path"])}"}} {item["seconds"]}')
+    return "\n".join(lines) + "\n"
+
+
+# Process-wide recorder, enabled by the CLI's --stats
+run_stats = RunStats()
@@ -1,16 +1,20 @@
-import hcl2
-from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from .iac_parser import IaCParser
+from .hcl_lexer import index_resource_blocks
+from .hcl_grammar import loads as load_hcl
+from .stats import run_stats
 import re
 
 class TerraformParser(IaCParser):
     TAG_KEY = "iac_tagger"
     
-    def get_resources(self, file_path: Path) -> Dict[str, dict]:
-        with open(file_path, 'r') as f:
-            tf_dict = hcl2.load(f)
-            
+    def load_resources(self, content: str) -> Tuple[Any, Dict[str, dict]]:
+        with run_stats.phase("parse.hcl"):
+            # The grammar only knows \n line breaks; splice offsets stay on the original text
+            tf_dict = load_hcl(content.replace('\r\n', '\n'))
+        return tf_dict, self.collect_resources(tf_dict)
+
+    def collect_resources(self, tf_dict: dict) -> Dict[str, dict]:
         resources = {}
         for block_type, blocks in tf_dict.items():
             if block_type == "resource":
@@ -20,6 +24,7 @@ class TerraformParser(IaCParser):
                             resource_id = f"{resource_type}.{resource_name}"
                             resources[resource_id] = config
         return resources
+
     def parse_and_split_merge_input(self,input_string):
         """
         Parses a Terraform merge input string and splits it into base_tags and dynamic_tags.
@@ -50,117 +55,94 @@ class TerraformParser(IaCParser):
         
         return base_tags, dynamic_tags
 
-    def update_tags(self, resource_block, new_tag):
-        if 'tags' in resource_block:
-            # Check if it's a merge format
-            if 'merge(' in resource_block:
-                # Match and extract the base and dynamic tag dictionaries
-                match = re.search(r'tags\s*=\s*merge\((.*?),\s*(\{.*?\})\)', resource_block, re.DOTALL)
-                if match:
-                    base_tags = match.group(1).strip()
-                    dynamic_tags = match.group(2).strip()
+    def get_tag(self, resource: dict) -> Optional[str]:
+        if "tags" not in resource:
+            return None
+        if isinstance(resource["tags"], str):
+            try:
+                base_tags, dynamic_tags = self.parse_and_split_merge_input(resource["tags"])
+            except (ValueError, SyntaxError, NameError):
+                return None
+            return base_tags.get(self.TAG_KEY)
+        return resource["tags"].get(self.TAG_KEY)
 
-                    # Update or add the TAG_KEY in the dynamic tags
-                    if self.TAG_KEY in dynamic_tags:
-                        # Update existing TAG_KEY
-                        modified_dynamic_tags = re.sub(
-                            rf'"?{self.TAG_KEY}"?\s*=\s*"[^"]*"',
-                            f'{self.TAG_KEY} = "{new_tag}"',
-                            dynamic_tags
-                        )
-                    else:
-                        # Add new TAG_KEY without modifying existing structure
-                        modified_dynamic_tags = re.sub(
-                            r'(\{)(.*?)(\})',
-                            rf'\1\2  {self.TAG_KEY} = "{new_tag}"\n  \3',
-                            dynamic_tags,
-                            flags=re.DOTALL
-                        )
+    def index_content(self, content: str) -> Dict[str, dict]:
+        _, resources = self.load_resources(content)
+        with run_stats.phase("lex.hcl"):
+            blocks = index_resource_blocks(content, self.TAG_KEY)
+        first_break = content.find('\n')
+        newline = '\r\n' if first_break > 0 and content[first_break - 1] == '\r' else '\n'
 
-                    # Rebuild the merge block without altering existing formatting
-                    modified_block = re.sub(
-                        r'tags\s*=\s*merge\((.*?),\s*(\{.*?\})\)',
-                        f'tags = merge({base_tags}, {modified_dynamic_tags})',
-                        resource_block,
-                        flags=re.DOTALL
-                    )
+        index = {}
+        for resource_id, resource in resources.items():
+            block = blocks.get(resource_id)
+            if block is None:
+                index[resource_id] = {
+                    "hash": self.generate_resource_hash(resource, self.TAG_KEY),
+                    "tag": self.get_tag(resource),
+                    "span": None,
+                    "edit": None,
+                }
+                continue
+            tags = block["tags"]
+            tag_span = tags["tag"] if tags else None
+            index[resource_id] = {
+                "hash": self.generate_resource_hash(resource, self.TAG_KEY),
+                # Read straight from the source, which also covers merge() tags
+                "tag": content[tag_span[0] + 1:tag_span[1] - 1] if tag_span else None,
+                "span": (block["start"], block["end"]),
+                "edit": self.find_tag_edit(content, block, newline),
+            }
+        return index
 
-                    return modified_block
-            else:
-                # Handle plain tags = { ... } format
-                # Ensure proper indentation for new tags
-                modified_block = re.sub(
-                    rf'(tags\s*=\s*\{{[^}}]*)"?{self.TAG_KEY}"?\s*=\s*"[^"]*"',
-                    f'\\1{self.TAG_KEY} = "{new_tag}"',
-                    resource_block
-                )
-                if modified_block == resource_block:  # If tag wasn't found, add it
-                    modified_block = re.sub(
-                        r'(tags\s*=\s*\{[^\}]*)}',
-                        rf'\1  {self.TAG_KEY} = "{new_tag}"\n  }}',
-                        resource_block,
-                        flags=re.DOTALL
-                    )
-                return modified_block
-        else:
-            # Add new tags block
-            modified_block = resource_block.rstrip('}') + '\n  tags = {\n    ' + f'{self.TAG_KEY} = "{new_tag}"\n  }}\n'             
-            return modified_block
-        return resource_block
+    def find_tag_edit(self, content: str, block: dict, newline: str = '\n') -> Optional[List]:
+        """
+        Locate where a resource block's tracking tag goes.
 
-    def add_tracking_tag(self, file_path: Path, resource_id: str) -> bool:
-        resources = self.get_resources(file_path)
-        if resource_id not in resources:
-            return False
-            
-        resource = resources[resource_id]
-        current_hash = self.generate_resource_hash(str(resource), self.TAG_KEY)
-        commit_hash = self.get_last_commit(file_path)
+        Returns:
+            list: [start, end, before, after], meaning content[start:end] is
+            replaced by before + <quoted tag> + after, or None when the tags
+            are not an object literal (e.g. `tags = var.tags`) and cannot be
+            edited safely.
+        """
+        key = self.TAG_KEY
+        tags = block["tags"]
+        if tags is None:
+            # Add new tags block before the closing brace of the resource
+            close = block["close"]
+            line_start = content.rfind('\n', 0, close) + 1
+            indent = _indent(content, line_start)
+            before = f"{newline}{indent}  tags = {{{newline}{indent}    {key} = "
+            after = f"{newline}{indent}  }}{newline}"
+            if content[line_start:close].strip():
+                # Closing brace shares its line, e.g. `resource "a" "b" { x = 1 }`
+                inner_end = len(content[:close].rstrip())
+                return [inner_end, close, before, after + indent]
+            return [line_start, line_start, before, after]
 
-        
-        # Check if tag already exists and is current
-        if "tags" in resource:
+        if tags["tag"]:
+            return [tags["tag"][0], tags["tag"][1], "", ""]
 
-            if isinstance(resource["tags"], str):
-                base_tags, dynamic_tags = self.parse_and_split_merge_input(resource["tags"])
-                existing_tag = base_tags.get(self.TAG_KEY)
-            else:
-                existing_tag = resource["tags"].get(self.TAG_KEY)
-            if existing_tag == f"{resource_id}:{current_hash}:{commit_hash}":
-                return False
-                
-        # Update the file with new tag
-        with open(file_path, 'r') as f:
-            content = f.read()
-            
-        # Add or update tag
-        new_tag = f'{resource_id}:{current_hash}:{commit_hash}'
-        
-        # Find the resource block and add/update the tag
-        resource_pattern = fr'resource\s+(?:"|){resource_id.split(".")[0]}(?:"|)\s+"{resource_id.split(".")[1]}"'
-        resource_match = re.search(resource_pattern, content)
-        
-        if resource_match:
-            # Find the closing brace of the resource block
-            start_pos = resource_match.start()
-            brace_count = 0
-            end_pos = start_pos
-            
-            for i in range(start_pos, len(content)):
-                if content[i] == '{':
-                    brace_count += 1
-                elif content[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end_pos = i
-                        break
-            
-            resource_block = content[start_pos:end_pos]
-            
-            modified_block = self.update_tags(resource_block, new_tag)
-            # Write the modified content back to file
-            new_content = content[:start_pos] + modified_block + content[end_pos:]
-            with open(file_path, 'w') as f:
-                f.write(new_content)
-        
-        return True 
\ No newline at end of file
+        objects = [obj for obj in tags["objects"] if obj[1] is not None]
+        if not objects:
+            return None
+        # With merge(), the last object literal holds the dynamic tags
+        open_pos, close = objects[-1]
+        line_start = content.rfind('\n', 0, close) + 1
+        if line_start > open_pos and not content[line_start:close].strip():
+            # Closing brace on its own line: add an entry line above it
+            indent = _indent(content, line_start)
+            return [line_start, line_start, f"{indent}  {key} = ", newline]
+        inner_end = len(content[:close].rstrip())
+        if inner_end == open_pos + 1:
+            return [open_pos + 1, close, f" {key} = ", " "]
+        separator = "" if content[inner_end - 1] == ',' else ","
+        return [inner_end, inner_end, f"{separator} {key} = ", ""]
+
+
+def _indent(content: str, line_start: int) -> str:
+    """Leading whitespace of the line starting at line_start"""
+    end = line_start
+    while end < len(content) and content[end] in ' \t':
+        end += 1
+    return content[line_start:end]
@@ -0,0 +1,169 @@
+"""
+File change watchers for the watch daemon.
+
+InotifyWatcher talks to the Linux inotify API through ctypes, so it needs
+no extra packages; PollingWatcher rescans the tree and compares mtimes and
+sizes, and works everywhere. Both honor the scanner's pruning and ignore
+rules and report changed files of the supported suffixes in batches.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from iac_tagger.scanner import filter_ignored, scan_directories, scan_files
+
+# Quiet time that ends a burst of events, e.g. an editor's save sequence
+DEBOUNCE = 0.05
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Detects changes by rescanning the tree every interval seconds"""
+
+    def __init__(self, root: str, suffixes: Iterable[str], recursive: bool = True, interval: float = 1.0):
+        self.root = root
+        self.suffixes = tuple(suffixes)
+        self.recursive = recursive
+        self.interval = interval
+        self._state = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        state = {}
+        for file_path in scan_files(self.root, self.suffixes, self.recursive):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            state[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout: Optional[float] = None) -> List[Path]:
+        """Block until files change, or for at most timeout seconds; return the changed files"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pause = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(pause)
+            state = self._snapshot()
+            changed = [file_path for file_path, signature in state.items() if self._state.get(file_path) != signature]
+            self._state = state
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Event-driven watcher on Linux inotify, with one watch per directory"""
+
+    def __init__(self, root: str, suffixes: Iterable[str], recursive: bool = True):
+        self.root = root
+        self.suffixes = tuple(suffixes)
+        self.recursive = recursive
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, str] = {}
+        for directory in scan_directories(root, recursive):
+            self._watch(str(directory))
+
+    def _watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            # Vanished or unreadable meanwhile; nothing to watch
+            return
+        self._directories[wd] = directory
+
+    def _read_events(self, timeout: Optional[float]) -> List[Tuple[int, int, str]]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def wait(self, timeout: Optional[float] = None) -> List[Path]:
+        """Block until files change, or for at most timeout seconds; return the changed files"""
+        changed: Set[str] = set()
+        events = self._read_events(timeout)
+        while events:
+            for wd, mask, name in events:
+                changed.update(self._handle(wd, mask, name))
+            # Gather the rest of the burst
+            events = self._read_events(DEBOUNCE)
+        if not changed:
+            return []
+        candidates = sorted(Path(path) for path in changed if path.endswith(self.suffixes) and os.path.isfile(path))
+        return list(filter_ignored(self.root, candidates))
+
+    def _handle(self, wd: int, mask: int, name: str) -> Iterable[str]:
+        if mask & _IN_Q_OVERFLOW:
+            # Events were dropped; treat every file as changed
+            return [str(path) for path in scan_files(self.root, self.suffixes, self.recursive)]
+        if mask & (_IN_IGNORED | _IN_DELETE_SELF):
+            self._directories.pop(wd, None)
+            return []
+        directory = self._directories.get(wd)
+        if directory is None or not name:
+            return []
+        path = os.path.join(directory, name)
+        if mask & _IN_ISDIR:
+            if not (self.recursive and mask & (_IN_CREATE | _IN_MOVED_TO)):
+                return []
+            # Watch the new subtree; files may have landed in it before the watch did
+            for subdirectory in scan_directories(path, True):
+                self._watch(str(subdirectory))
+            return [str(file_path) for file_path in scan_files(path, self.suffixes, True)]
+        if mask & _IN_CREATE:
+            # Wait for the close of the write, or the rename of an atomic save
+            return []
+        return [path]
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _load_libc() -> ctypes.CDLL:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    # AttributeError here means no inotify, e.g. not on Linux
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def create_watcher(root: str, suffixes: Iterable[str], recursive: bool = True, polling: bool = False,
+                   interval: float = 1.0):
+    """Return an InotifyWatcher where available, else (or with polling) a PollingWatcher"""
+    if not polling:
+        try:
+            return InotifyWatcher(root, suffixes, recursive)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, suffixes, recursive, interval)
@@ -0,0 +1,91 @@
+"""
+Write-back of tagged files.
+
+A file is replaced by writing its new content to a temporary file next to
+it, syncing that, and renaming it over the original, so an interrupted run
+(or a crash) leaves every file either untouched or fully tagged, never
+truncated. Symlinks are written through, like open(path, 'w') would, so a
+linked .tf keeps being a link and its target gets the tags. Parsers skip
+the write altogether when the new content equals what they read, so mtimes
+only move on files that really changed and Terraform, make or git hooks
+downstream have nothing to redo.
+
+Making a rename durable takes an fsync of the directory holding the new
+name as well. A WriteBack defers those to flush(), at the end of a run (or
+of a batch), where each directory is synced once rather than once per file
+written into it. Until then a crash may undo a rename, leaving the old
+content in place, but never a partial file.
+"""
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Set, Union
+
+from iac_tagger.stats import run_stats
+
+
+def replace_file(file_path: Union[str, Path], content: str, sync_directory: bool = True) -> int:
+    """
+    Atomically replace file_path (or the file it links to) with content,
+    keeping its permissions and line endings as given. The data is always
+    fsynced before the rename; with sync_directory the rename is too.
+    Returns the number of bytes written.
+    """
+    file_path = Path(os.path.realpath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    if sync_directory:
+        _fsync_directory(str(file_path.parent))
+    return written
+
+
+class WriteBack:
+    """Directories of files replaced with sync_directory=False, synced together by flush(); thread-safe"""
+
+    def __init__(self):
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, file_path: Union[str, Path]) -> None:
+        """Note a file replaced with sync_directory=False"""
+        directory = os.path.dirname(os.path.realpath(file_path))
+        with self._lock:
+            self._pending.add(directory)
+
+    def flush(self) -> None:
+        """Sync each directory written into since the last flush, once"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return
+        with run_stats.phase("fsync"):
+            for directory in sorted(pending):
+                _fsync_directory(directory)
+                run_stats.count("fsync_dirs")
+
+
+def _fsync_directory(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        # Directories cannot be opened on every platform (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Nor synced on every file system
+        pass
+    finally:
+        os.close(fd)
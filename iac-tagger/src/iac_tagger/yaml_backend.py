@@ -0,0 +1,106 @@
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+# PyYAML is imported by the functions that need it, so listing the backends
+# (e.g. for --yaml-backend) costs nothing at start-up
+BACKENDS = ("auto", "libyaml", "ruamel", "pure")
+
+
+class YamlBackend:
+    """
+    The YAML implementation used by KubernetesParser.
+
+    Every backend exposes PyYAML's composer/constructor loader interface
+    (check_node, get_node, construct_document), whose node marks carry the
+    character offsets the label splicing relies on. Label values are always
+    rendered with PyYAML's dumper so output does not depend on the backend.
+
+    libyaml and pure both resolve scalars the YAML 1.1 way and give the same
+    documents, hence the same hashes. ruamel resolves YAML 1.2 (`yes` stays a
+    string, `0644` is 644), so resources using such scalars hash, and are
+    tagged, differently under it; it is therefore only used when asked for.
+    """
+
+    def __init__(self, name: str, loader_class: Callable[[str], Any], dumper_class: Any):
+        self.name = name
+        self.loader_class = loader_class
+        self.dumper_class = dumper_class
+
+    def loader(self, content: str) -> Any:
+        return self.loader_class(content)
+
+    def load_all(self, content: str) -> List[Any]:
+        loader = self.loader(content)
+        try:
+            documents = []
+            while loader.check_node():
+                documents.append(loader.construct_document(loader.get_node()))
+            return documents
+        finally:
+            loader.dispose()
+
+    def dump_scalar(self, value: str) -> str:
+        """Render value as a single-line YAML scalar, quoted only when needed"""
+        import yaml
+
+        text = yaml.dump(value, Dumper=self.dumper_class, width=1 << 20)
+        return text.split('\n', 1)[0]
+
+
+def _libyaml() -> Optional[YamlBackend]:
+    import yaml
+
+    if not getattr(yaml, '__with_libyaml__', False):
+        return None
+    return YamlBackend("libyaml", yaml.CSafeLoader, yaml.CSafeDumper)
+
+
+def _ruamel() -> Optional[YamlBackend]:
+    try:
+        from ruamel.yaml.cyaml import CSafeLoader
+        # Some ruamel.yaml/ruamel.yaml.clib combinations import but cannot compose
+        probe = CSafeLoader("a: 1\n")
+        probe.check_node()
+        probe.get_node()
+        probe.dispose()
+    except Exception:
+        return None
+    import yaml
+
+    dumper = yaml.CSafeDumper if getattr(yaml, '__with_libyaml__', False) else yaml.SafeDumper
+    return YamlBackend("ruamel", CSafeLoader, dumper)
+
+
+def _pure() -> YamlBackend:
+    import yaml
+
+    return YamlBackend("pure", yaml.SafeLoader, yaml.SafeDumper)
+
+
+_FACTORIES: Dict[str, Callable[[], Optional[YamlBackend]]] = {
+    "libyaml": _libyaml,
+    "ruamel": _ruamel,
+    "pure": _pure,
+}
+
+
+def get_yaml_backend(name: str = "auto") -> YamlBackend:
+    """
+    Pick a YAML backend by name.
+
+    "auto" prefers the libyaml C bindings, then PyYAML's pure-Python
+    implementation, which produce the same documents; ruamel is never picked
+    automatically (see YamlBackend). A named backend that is not
+    installed falls back to "auto" with a warning; check the returned
+    backend's name to see which one is in use.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown YAML backend {name!r}, expected one of: {', '.join(BACKENDS)}")
+
+    if name != "auto":
+        backend = _FACTORIES[name]()
+        if backend is not None:
+            return backend
+        warnings.warn(f"YAML backend {name!r} is not available, falling back to auto")
+
+    return _libyaml() or _pure()
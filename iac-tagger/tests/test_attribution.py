@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import commit_all
+from iac_tagger.main import IaCTagger
+from iac_tagger.terraform_parser import TerraformParser
+
+RESOURCES = '''resource "aws_instance" "a" {
+  ami = "ami-a"
+}
+
+resource "aws_instance" "b" {
+  ami = "ami-b"
+}
+'''
+
+
+@pytest.fixture
+def commit(repo, monkeypatch):
+    """commit_all with strictly increasing commit times, so blame picks the newest commit reliably"""
+    times = iter(range(1700000000, 1800000000, 100))
+
+    def commit(message):
+        date = f"@{next(times)} +0000"
+        monkeypatch.setenv("GIT_AUTHOR_DATE", date)
+        monkeypatch.setenv("GIT_COMMITTER_DATE", date)
+        return commit_all(repo, message)[:8]
+
+    return commit
+
+
+def _tag(file_path):
+    tagger = IaCTagger(attribution="resource")
+    try:
+        return tagger.process_file(str(file_path))
+    finally:
+        tagger.close()
+
+
+def _commits(file_path):
+    index = TerraformParser().index_content(file_path.read_text())
+    return {resource_id: entry["tag"].rsplit(":", 1)[1] for resource_id, entry in index.items()}
+
+
+def test_each_resource_gets_the_commit_of_its_own_lines(repo, commit):
+    file_path = repo / "main.tf"
+    file_path.write_text(RESOURCES)
+    added = commit("add resources")
+    assert _tag(file_path) is True
+    assert _commits(file_path) == {"aws_instance.a": added, "aws_instance.b": added}
+
+    # Committing the tagger's own tag lines changes no resource's commit
+    commit("commit tags")
+    assert _tag(file_path) is False
+    assert _commits(file_path) == {"aws_instance.a": added, "aws_instance.b": added}
+
+    # A commit touching only b retags only b
+    tagged_a = file_path.read_text().split('resource "aws_instance" "b"')[0]
+    file_path.write_text(file_path.read_text().replace('"ami-b"', '"ami-b2"'))
+    changed = commit("change b")
+    assert _tag(file_path) is True
+    assert _commits(file_path) == {"aws_instance.a": added, "aws_instance.b": changed}
+    assert file_path.read_text().startswith(tagged_a)
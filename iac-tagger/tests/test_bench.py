@@ -0,0 +1,30 @@
+import json
+
+from iac_tagger.bench import main
+
+
+def test_bench_reports_every_operation_on_a_small_repository(tmp_path):
+    workdir = tmp_path / "bench"
+    output = tmp_path / "bench.json"
+
+    main(["--tf-files", "2", "--resources", "3", "--k8s-files", "1", "--documents", "2", "--commits", "3",
+          "--workdir", str(workdir), "--keep", "-o", str(output)])
+
+    report = json.loads(output.read_text())
+    assert set(report["results"]) == {
+        "get_resources", "generate_resource_hash", "add_tracking_tag", "add_tracking_tags",
+        "process_directory_cold", "process_directory_tagged", "process_directory_warm"}
+    assert report["results"]["get_resources"]["calls"] == 3
+    assert report["results"]["generate_resource_hash"]["calls"] == 3 * 2 + 2
+    assert report["params"]["tf_files"] == 2
+    # The cold run tagged the generated repository
+    assert all("iac_tagger" in path.read_text() for path in (workdir / "repo" / "terraform").rglob("*.tf"))
+
+
+def test_bench_cleans_up_its_workdir(tmp_path, capsys):
+    workdir = tmp_path / "bench"
+
+    main(["--tf-files", "1", "--resources", "1", "--k8s-files", "0", "--commits", "1", "--workdir", str(workdir)])
+
+    assert json.loads(capsys.readouterr().out)["results"]["process_directory_warm"]["calls"] == 1
+    assert not workdir.exists()
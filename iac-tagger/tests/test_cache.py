@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from iac_tagger.cache import ResourceCache
+from iac_tagger.main import IaCTagger
+
+from conftest import commit_all
+
+
+def test_unusable_cache_warns_once_and_is_skipped(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = ResourceCache(str(blocker / "cache"))
+    with pytest.warns(UserWarning, match="continuing without it") as warned:
+        assert cache.get("key") is None
+        cache.put("key", {})
+        assert cache.get("key") is None
+    assert len(warned) == 1
+    assert not cache.usable()
+    cache.close()
+
+
+def test_tagging_works_without_a_usable_cache(repo):
+    (repo / "main.tf").write_text('resource "aws_instance" "web" {\n  ami = "ami-123"\n}\n')
+    commit_all(repo, "add main.tf")
+    blocker = repo / "not-a-dir"
+    blocker.write_text("")
+    tagger = IaCTagger(resource_cache=ResourceCache(str(blocker)))
+    try:
+        with pytest.warns(UserWarning):
+            assert tagger.process_file(str(repo / "main.tf"))
+        assert tagger.check_file(str(repo / "main.tf")) == {"aws_instance.web": "current"}
+    finally:
+        tagger.close()
+
+
+def test_eviction_keeps_the_newest_entries_within_max_bytes(tmp_path):
+    entry = {"r": {"hash": "0" * 100, "tag": None, "span": None}}
+    cache = ResourceCache(str(tmp_path), max_bytes=3 * 150)
+    for number in range(5):
+        cache.put(f"key{number}", entry)
+    cache.get("key0")
+    cache.close()
+
+    cache = ResourceCache(str(tmp_path))
+    kept = [number for number in range(5) if cache.get(f"key{number}") is not None]
+    cache.close()
+    assert kept == [0, 3, 4]
+
+
+def test_eviction_keeps_at_most_max_entries(tmp_path):
+    cache = ResourceCache(str(tmp_path), max_entries=2)
+    for number in range(4):
+        cache.put(f"key{number}", {})
+    cache.close()
+    cache = ResourceCache(str(tmp_path))
+    assert [number for number in range(4) if cache.get(f"key{number}") is not None] == [2, 3]
+    cache.close()
+
+
+def test_hits_are_recorded_at_flush_and_honored_by_eviction(tmp_path, monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr("iac_tagger.cache.time.time", lambda: next(clock))
+    cache = ResourceCache(str(tmp_path), max_entries=2)
+    for number in range(3):
+        cache.put(f"key{number}", {})
+    assert cache.get("key0") == {}
+    # Reads leave the database alone until flushed
+    assert _last_used(tmp_path) == {"key0": 1, "key1": 2, "key2": 3}
+    cache.close()
+
+    cache = ResourceCache(str(tmp_path))
+    assert [number for number in range(3) if cache.get(f"key{number}") is not None] == [0, 2]
+    cache.close()
+
+
+def _last_used(cache_dir):
+    with sqlite3.connect(str(cache_dir / "resources.sqlite")) as conn:
+        return dict(conn.execute("SELECT key, last_used FROM resources").fetchall())
@@ -0,0 +1,58 @@
+from conftest import commit_all
+from iac_tagger.iac_parser import canonical_hash
+from iac_tagger.kubernetes_parser import KubernetesParser
+from iac_tagger.main import IaCTagger
+
+ANCHORED = '''apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: web
+  labels: &labels
+    app: web
+spec:
+  selector:
+    matchLabels: *labels
+'''
+
+
+def test_tagger_entry_does_not_change_the_hash():
+    resource = {"ami": "ami-123", "tags": {"Name": "web"}}
+
+    assert canonical_hash(dict(resource, tags={"Name": "web", "iac_tagger": "x:1:2"})) == canonical_hash(resource)
+    # Empty tags left once the entry is gone count as no tags
+    assert canonical_hash({"ami": "ami-123", "tags": {"iac_tagger": "x:1:2"}}) == canonical_hash({"ami": "ami-123"})
+    assert canonical_hash({"ami": "ami-123", "tags": 'merge(var.tags, {iac_tagger = "x:1:2"})'}) == \
+        canonical_hash({"ami": "ami-123", "tags": "merge(var.tags, {})"})
+
+
+def test_hash_is_structural():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": [1, 2]}) != canonical_hash({"a": [2, 1]})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": "1"})
+    assert canonical_hash({"a": True}) != canonical_hash({"a": 1})
+    assert canonical_hash({"a": None}) != canonical_hash({"a": "None"})
+    assert canonical_hash({"ab": "c"}) != canonical_hash({"a": "bc"})
+
+
+def test_aliased_labels_carry_no_tag_into_the_hash():
+    parser = KubernetesParser()
+    labels = {"app": "web"}
+    tagged = dict(labels, iac_tagger="deployment.default.web:1:2")
+
+    def deployment(labels):
+        # As loaded from `labels: &labels` ... `matchLabels: *labels`: one mapping in two places
+        return {"kind": "Deployment", "metadata": {"labels": labels}, "spec": {"selector": {"matchLabels": labels}}}
+
+    assert parser.generate_resource_hash(deployment(tagged)) == parser.generate_resource_hash(deployment(labels))
+
+
+def test_aliased_labels_are_not_tagged(repo):
+    # The label would also land in the (immutable) selector
+    (repo / "deploy.yaml").write_text(ANCHORED)
+    commit_all(repo, "add deploy.yaml")
+    tagger = IaCTagger()
+    try:
+        assert tagger.process_file(str(repo / "deploy.yaml")) is False
+        assert tagger.check_file(str(repo / "deploy.yaml")) == {"deployment.default.web": "untaggable"}
+    finally:
+        tagger.close()
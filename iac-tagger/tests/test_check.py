@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from conftest import commit_all
+from iac_tagger.cache import ResourceCache
+from iac_tagger.main import IaCTagger, _finish_check
+
+UNTAGGABLE = '''resource "aws_instance" "web" {
+  ami  = "ami-123"
+  tags = var.tags
+}
+
+resource "aws_instance" "db" {
+  ami = "ami-456"
+}
+'''
+
+
+def test_resources_with_uneditable_tags_are_untaggable(repo):
+    (repo / "main.tf").write_text(UNTAGGABLE)
+    commit_all(repo, "add main.tf")
+    tagger = IaCTagger()
+    try:
+        assert tagger.check_file(str(repo / "main.tf")) == {
+            "aws_instance.web": "untaggable", "aws_instance.db": "missing"}
+        tagger.process_file(str(repo / "main.tf"))
+        assert tagger.check_file(str(repo / "main.tf")) == {
+            "aws_instance.web": "untaggable", "aws_instance.db": "current"}
+    finally:
+        tagger.close()
+
+
+def test_untaggable_resources_do_not_fail_a_check():
+    totals = {"current": 1, "stale": 0, "missing": 0, "untaggable": 2, "errors": 0}
+    _finish_check(totals, jsonl=True)
+    with pytest.raises(SystemExit):
+        _finish_check(dict(totals, missing=1), jsonl=True)
+
+
+def test_check_does_not_create_a_cache(repo):
+    (repo / "main.tf").write_text(UNTAGGABLE)
+    commit_all(repo, "add main.tf")
+    cache_dir = repo / ".iac_tagger_cache"
+    tagger = IaCTagger(resource_cache=ResourceCache(str(cache_dir), read_only=True))
+    try:
+        tagger.check_file(str(repo / "main.tf"))
+    finally:
+        tagger.close()
+    assert not cache_dir.exists()
+
+
+def test_read_only_cache_reads_without_writing(tmp_path):
+    cache = ResourceCache(str(tmp_path))
+    cache.put("key", {"a": {"hash": "h", "tag": None, "span": None}})
+    cache.close()
+    last_used = _last_used(tmp_path)
+
+    read_only = ResourceCache(str(tmp_path), read_only=True)
+    assert read_only.get("key") == {"a": {"hash": "h", "tag": None, "span": None}}
+    assert read_only.get("other") is None
+    read_only.put("other", {})
+    read_only.close()
+    assert _last_used(tmp_path) == last_used
+    assert ResourceCache(str(tmp_path)).get("other") is None
+
+
+def _last_used(cache_dir):
+    with sqlite3.connect(str(cache_dir / "resources.sqlite")) as conn:
+        return conn.execute("SELECT key, last_used FROM resources").fetchall()
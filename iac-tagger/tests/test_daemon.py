@@ -0,0 +1,61 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from conftest import commit_all
+from iac_tagger.daemon import request
+
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+RESOURCE = 'resource "aws_instance" "{name}" {{\n  ami = "ami-123"\n}}\n'
+
+
+@pytest.fixture
+def daemon(repo, tmp_path):
+    """A `--watch --socket` daemon polling repo, yielding its socket path"""
+    (repo / "main.tf").write_text(RESOURCE.format(name="web"))
+    commit_all(repo, "add main.tf")
+    socket_path = str(tmp_path / "daemon.sock")
+    env = dict(os.environ, PYTHONPATH=SRC)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "iac_tagger.main", "-d", str(repo), "-r", "--watch", "--poll",
+         "--socket", socket_path, "--cache-dir", str(tmp_path / "cache"), "--jsonl"],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        _wait_for(lambda: os.path.exists(socket_path) or process.poll() is not None)
+        assert process.poll() is None, process.communicate()
+        yield process, socket_path
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_daemon_answers_requests_and_cleans_up_on_sigterm(repo, daemon):
+    process, socket_path = daemon
+    # The warm-up pass tags what is already there
+    assert "iac_tagger" in (repo / "main.tf").read_text()
+
+    (repo / "extra.tf").write_text(RESOURCE.format(name="extra"))
+    assert request(socket_path, [str(repo / "extra.tf")]) == {str(repo / "extra.tf"): True}
+    assert request(socket_path, [str(repo / "extra.tf"), str(repo / "main.tf")], check=True) == {
+        str(repo / "extra.tf"): {"aws_instance.extra": "current"},
+        str(repo / "main.tf"): {"aws_instance.web": "current"},
+    }
+
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=30) == 0
+    assert not os.path.exists(socket_path)
+    with pytest.raises(OSError):
+        request(socket_path, [str(repo / "main.tf")])
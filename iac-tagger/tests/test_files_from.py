@@ -0,0 +1,51 @@
+import io
+import json
+import sys
+
+import pytest
+
+from conftest import commit_all
+from iac_tagger.main import main
+
+RESOURCE = 'resource "aws_instance" "{name}" {{\n  ami = "ami-123"\n}}\n'
+
+
+@pytest.fixture
+def project(repo, monkeypatch):
+    for name in ["a", "b"]:
+        (repo / f"{name}.tf").write_text(RESOURCE.format(name=name))
+    (repo / "README.md").write_text("# project\n")
+    (repo / "alias.tf").symlink_to("a.tf")
+    commit_all(repo, "add project")
+    monkeypatch.chdir(repo)
+    return repo
+
+
+def _files_from(monkeypatch, capsys, cache_dir, listing, *args):
+    """JSONL records printed for a --files-from run reading listing from stdin"""
+    monkeypatch.setattr(sys, "argv", ["iac-tagger", "--files-from", "-", "--cache-dir", str(cache_dir), *args])
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(listing)))
+    main()
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_repeated_paths_are_processed_once_and_missing_ones_reported(project, tmp_path, monkeypatch, capsys):
+    # Repeats spelled differently and through a symlink; blank lines and unsupported files are skipped
+    listing = b"a.tf\n./a.tf\n\nREADME.md\nmissing.tf\nb.tf\r\nalias.tf\n" + str(project / "a.tf").encode() + b"\n"
+
+    records = _files_from(monkeypatch, capsys, tmp_path / "cache", listing)
+
+    assert [(record["file"], record["status"]) for record in records] == [
+        ("a.tf", "modified"), ("missing.tf", "error"), ("b.tf", "modified")]
+    assert "missing.tf" in records[1]["error"]
+    assert "iac_tagger" in (project / "a.tf").read_text()
+
+
+def test_nul_terminated_paths_with_jobs(project, tmp_path, monkeypatch, capsys):
+    (project / "new\nline.tf").write_text(RESOURCE.format(name="c"))
+    listing = b"a.tf\0b.tf\0a.tf\0new\nline.tf"
+
+    records = _files_from(monkeypatch, capsys, tmp_path / "cache", listing, "-z", "-j", "2")
+
+    assert [(record["file"], record["status"]) for record in records] == [
+        ("a.tf", "modified"), ("b.tf", "modified"), ("new\nline.tf", "modified")]
@@ -0,0 +1,62 @@
+import subprocess
+
+from conftest import commit_all, git
+from iac_tagger.git_history import CommitResolver
+
+
+def _edit(repo, name, content, message):
+    (repo / name).write_text(content)
+    return commit_all(repo, message)
+
+
+def _merge(repo, *args):
+    # Conflicts are resolved by the caller
+    try:
+        git(repo, "merge", "-q", "--no-edit", *args)
+    except subprocess.CalledProcessError:
+        pass
+
+
+def test_last_commits_match_git_log(repo):
+    for name in ("ours.tf", "conflict.tf", "both.tf", "side.tf"):
+        (repo / name).write_text(f"# {name}\n")
+    root = commit_all(repo, "add files")
+
+    # Changes a merge discards with `-s ours` do not count
+    git(repo, "checkout", "-q", "-b", "discarded")
+    _edit(repo, "ours.tf", "# discarded\n", "discarded change")
+    git(repo, "checkout", "-q", "main")
+    _merge(repo, "-s", "ours", "discarded")
+
+    # Nor do those of a conflict resolved to the other side
+    git(repo, "checkout", "-q", "-b", "theirs")
+    _edit(repo, "conflict.tf", "# theirs\n", "their conflict")
+    side = _edit(repo, "side.tf", "# side\n", "side change")
+    _edit(repo, "both.tf", "# theirs\n", "their both")
+    git(repo, "checkout", "-q", "main")
+    kept = _edit(repo, "conflict.tf", "# ours\n", "our conflict")
+    _edit(repo, "both.tf", "# ours\n", "our both")
+    _merge(repo, "theirs")
+    (repo / "conflict.tf").write_text("# ours\n")
+    # A path that differs from all parents of a merge was last changed by the merge
+    (repo / "both.tf").write_text("# merged\n")
+    merge = commit_all(repo, "merge theirs")
+
+    # Octopus merges send each path into the first parent it came from
+    for branch in ("one", "two"):
+        git(repo, "checkout", "-q", "-b", branch, "main")
+        _edit(repo, f"{branch}.tf", f"# {branch}\n", f"add {branch}")
+    git(repo, "checkout", "-q", "main")
+    _merge(repo, "one", "two")
+
+    resolver = CommitResolver()
+    try:
+        for rel_path in git(repo, "ls-files").splitlines():
+            expected = git(repo, "log", "-n", "1", "--format=%H", "--", rel_path)
+            assert resolver.get_last_commit(repo / rel_path) == expected, rel_path
+        assert resolver.get_last_commit(repo / "ours.tf") == root
+        assert resolver.get_last_commit(repo / "conflict.tf") == kept
+        assert resolver.get_last_commit(repo / "side.tf") == side
+        assert resolver.get_last_commit(repo / "both.tf") == merge
+    finally:
+        resolver.close()
@@ -0,0 +1,31 @@
+import hcl2
+import pytest
+
+from iac_tagger import hcl_grammar
+
+SOURCE = '''resource "aws_instance" "web" {
+  ami  = "ami-123"
+  tags = { Name = "web" }
+}
+'''
+
+
+@pytest.fixture
+def fresh_grammar(monkeypatch):
+    monkeypatch.setattr(hcl_grammar, "_parser", None)
+    monkeypatch.setattr(hcl_grammar, "_transformer_class", None)
+    monkeypatch.setattr(hcl_grammar, "_fallback", False)
+
+
+def test_loads_matches_hcl2(fresh_grammar):
+    assert hcl_grammar.loads(SOURCE) == hcl2.loads(SOURCE + "\n")
+
+
+def test_falls_back_to_hcl2_when_the_grammar_cannot_be_loaded(fresh_grammar, monkeypatch):
+    def broken_load():
+        raise AttributeError("module has no attribute 'DictTransformer'")
+
+    monkeypatch.setattr(hcl_grammar, "_load", broken_load)
+    with pytest.warns(UserWarning, match="using hcl2.loads"):
+        assert hcl_grammar.loads(SOURCE) == hcl2.loads(SOURCE)
+    assert hcl_grammar.loads(SOURCE) == hcl2.loads(SOURCE)
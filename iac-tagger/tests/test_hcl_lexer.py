@@ -0,0 +1,111 @@
+from iac_tagger.hcl_lexer import index_resource_blocks, skip_string
+
+
+def _span(content, span):
+    return content[span[0]:span[1]]
+
+
+def test_braces_in_strings_do_not_nest():
+    content = '''resource "aws_instance" "web" {
+  user_data = "}{ ${jsonencode({a = "}"})} $${x} }"
+  tags = {
+    Name       = "web {"
+    iac_tagger = "aws_instance.web:a:b"
+  }
+}
+
+resource "aws_s3_bucket" "logs" {}
+'''
+    blocks = index_resource_blocks(content, "iac_tagger")
+
+    assert list(blocks) == ["aws_instance.web", "aws_s3_bucket.logs"]
+    web = blocks["aws_instance.web"]
+    assert content[web["close"]] == "}"
+    assert content[web["end"]:].startswith("\n\nresource")
+    assert _span(content, web["tags"]["tag"]) == '"aws_instance.web:a:b"'
+
+
+def test_heredocs_are_skipped():
+    content = '''resource "aws_iam_policy" "p" {
+  policy = <<-EOT
+    { "tags": { "iac_tagger": "not this" }
+    resource "fake" "block" {
+    EOT
+  description = <<EOF
+}
+EOF
+  tags = { iac_tagger = "aws_iam_policy.p:a:b" }
+}
+'''
+    blocks = index_resource_blocks(content, "iac_tagger")
+
+    assert list(blocks) == ["aws_iam_policy.p"]
+    tags = blocks["aws_iam_policy.p"]["tags"]
+    assert _span(content, tags["tag"]) == '"aws_iam_policy.p:a:b"'
+    assert len(tags["objects"]) == 1
+
+
+def test_comments_are_skipped():
+    content = '''# resource "commented" "out" {
+// tags = {
+/* resource "block" "comment" {
+   } */
+resource "aws_vpc" "main" {
+  cidr_block = "10.0.0.0/16" # }
+  // tags = { iac_tagger = "no" }
+  tags = merge(var.tags, {
+    /* iac_tagger = "no" */
+    iac_tagger = "aws_vpc.main:a:b" # trailing
+  })
+}
+'''
+    blocks = index_resource_blocks(content, "iac_tagger")
+
+    assert list(blocks) == ["aws_vpc.main"]
+    tags = blocks["aws_vpc.main"]["tags"]
+    assert _span(content, tags["tag"]) == '"aws_vpc.main:a:b"'
+    value = _span(content, (tags["value_start"], tags["value_end"]))
+    assert value.startswith("merge(") and value.endswith(")")
+
+
+def test_uneditable_tags_have_no_objects():
+    content = 'resource "aws_vpc" "main" {\n  tags = var.tags\n}\n'
+    tags = index_resource_blocks(content, "iac_tagger")["aws_vpc.main"]["tags"]
+
+    assert tags["objects"] == []
+    assert tags["tag"] is None
+
+
+def test_skip_string_handles_escapes_and_templates():
+    content = '"a \\" ${"}"} %{ if x }b%{ endif }" tail'
+
+    assert content[skip_string(content, 0):] == " tail"
+
+
+def _tags(value):
+    content = f'resource "aws_vpc" "main" {{\n  tags = {value}\n}}\n'
+    return content, index_resource_blocks(content, "iac_tagger")["aws_vpc.main"]["tags"]
+
+
+def test_for_expressions_are_not_tags_objects():
+    for value in ('{ for k, v in var.extra : k => v }', 'merge(var.tags, { for k, v in var.extra : k => v })'):
+        _, tags = _tags(value)
+        assert tags["objects"] == [], value
+
+
+def test_nested_maps_are_not_tags_objects():
+    content, tags = _tags('{\n    Extra = { iac_tagger = "nested" }\n  }')
+
+    assert [_span(content, (open_pos, close + 1)) for open_pos, close in tags["objects"]] == [
+        '{\n    Extra = { iac_tagger = "nested" }\n  }']
+    assert tags["tag"] is None
+
+
+def test_conditional_values_have_no_tags_objects():
+    _, tags = _tags('var.on ? { A = "1", iac_tagger = "x" } : {}')
+    assert tags["objects"] == []
+    assert tags["tag"] is None
+
+    # A conditional argument of merge() only rules out that argument
+    content, tags = _tags('merge(var.on ? { A = "1" } : {}, { B = "2" })')
+    assert [_span(content, (open_pos, close + 1)) for open_pos, close in tags["objects"]] == ['{ B = "2" }']
@@ -0,0 +1,89 @@
+import shutil
+
+from conftest import commit_all, git
+from iac_tagger.inventory import Inventory
+from iac_tagger.main import IaCTagger
+
+MAIN = '''resource "aws_instance" "web" {
+  ami = "ami-123"
+}
+'''
+
+NETWORK = '''resource "aws_vpc" "main" {
+  cidr_block = "10.0.0.0/16"
+}
+'''
+
+
+def _tag(repo, inventory_path, since=None):
+    inventory = Inventory(str(inventory_path), str(repo))
+    tagger = IaCTagger(inventory=inventory)
+    try:
+        tagger.process_directory(str(repo), recursive=True, since=since)
+    finally:
+        tagger.close()
+
+
+def _paths(inventory_path):
+    inventory = Inventory(str(inventory_path))
+    try:
+        return {path for (path,) in inventory.conn.execute("SELECT path FROM resources")}
+    finally:
+        inventory.close()
+
+
+def _write_tree(repo):
+    (repo / "main.tf").write_text(MAIN)
+    (repo / "modules").mkdir()
+    (repo / "modules" / "network.tf").write_text(NETWORK)
+    commit_all(repo, "add resources")
+
+
+def test_paths_are_the_same_from_every_checkout(repo, tmp_path):
+    _write_tree(repo)
+    inventory_path = tmp_path / "inventory.sqlite"
+    _tag(repo, inventory_path)
+    other = tmp_path / "other"
+    shutil.copytree(repo, other)
+    _tag(other, inventory_path)
+
+    assert _paths(inventory_path) == {"main.tf", "modules/network.tf"}
+
+
+def test_full_run_drops_files_no_longer_found(repo, tmp_path):
+    _write_tree(repo)
+    inventory_path = tmp_path / "inventory.sqlite"
+    _tag(repo, inventory_path)
+    (repo / "modules" / "network.tf").unlink()
+    _tag(repo, inventory_path)
+
+    assert _paths(inventory_path) == {"main.tf"}
+    inventory = Inventory(str(inventory_path))
+    try:
+        assert inventory.lookup("aws_vpc.main", "resource") == []
+    finally:
+        inventory.close()
+
+
+def test_since_run_drops_deleted_files(repo, tmp_path):
+    _write_tree(repo)
+    inventory_path = tmp_path / "inventory.sqlite"
+    _tag(repo, inventory_path)
+    head = commit_all(repo, "tag resources")
+    git(repo, "rm", "-q", "modules/network.tf")
+    commit_all(repo, "remove the network")
+    _tag(repo, inventory_path, since=head)
+
+    assert _paths(inventory_path) == {"main.tf"}
+
+
+def test_prune_keeps_files_outside_the_directory(tmp_path):
+    inventory = Inventory(str(tmp_path / "inventory.sqlite"), str(tmp_path))
+    try:
+        for name in ("a/one.tf", "a/b/two.tf", "c/three.tf"):
+            inventory.update_file(tmp_path / name, [("aws_vpc.main", None, 1, 3)])
+        assert inventory.prune(tmp_path / "a", [], recursive=False) == 1
+        assert inventory.prune(tmp_path / "a", []) == 1
+        assert {path for (path,) in inventory.conn.execute("SELECT path FROM resources")} == {"c/three.tf"}
+    finally:
+        inventory.close()
@@ -0,0 +1,119 @@
+import warnings
+
+import pytest
+import yaml
+
+from conftest import commit_all
+from iac_tagger.kubernetes_parser import KubernetesParser
+from iac_tagger.main import IaCTagger
+from iac_tagger.yaml_backend import get_yaml_backend
+
+TAG = "configmap.default.settings:1a2b3c4d:5e6f7a8b"
+
+
+def _retag(content, backend="pure"):
+    """content with every document tagged TAG, checking that nothing outside the edits changed"""
+    parser = KubernetesParser(yaml_backend=backend)
+    index = parser.index_content(content)
+    new_tags = {resource_id: TAG for resource_id in index}
+    tagged = parser.apply_tags(content, index, new_tags)
+
+    # Outside the edited spans the text must stay byte for byte the same
+    expected = ""
+    position = 0
+    for start, end, before, after in sorted(entry["edit"] for entry in index.values()):
+        expected += content[position:start] + before + parser.format_tag(TAG) + after
+        position = end
+    assert tagged == expected + content[position:]
+    return tagged
+
+
+def _labels(tagged):
+    return [doc["metadata"].get("labels") for doc in yaml.safe_load_all(tagged.lstrip("\ufeff")) if doc]
+
+
+def _configmap(metadata):
+    return f"apiVersion: v1\nkind: ConfigMap\nmetadata:\n{metadata}data:\n  key: value\n"
+
+
+@pytest.mark.parametrize("metadata", [
+    "  name: settings\n  labels:\n    app: web\n",
+    "  name: settings\n  labels: {app: web}\n",
+    "  name: settings\n  labels:\n",
+    "  name: settings\n  labels: ~\n",
+    "  name: settings\n  labels: {}\n",
+    "  name: settings\n",
+    "  {name: settings}\n",
+])
+def test_labels_of_every_shape_are_tagged(metadata):
+    tagged = _retag(_configmap(metadata))
+
+    labels = _labels(tagged)[0]
+    assert labels["iac_tagger"] == TAG
+    if "app" in metadata:
+        assert labels["app"] == "web"
+
+
+def test_existing_label_value_is_replaced_in_place():
+    content = _configmap("  name: settings\n  labels:\n    iac_tagger: old   # tracked\n    app: web\n")
+    tagged = _retag(content)
+
+    assert tagged == content.replace("iac_tagger: old", f"iac_tagger: {TAG}")
+
+
+def test_four_space_indentation_and_trailing_comments_are_kept():
+    content = ("apiVersion: v1\nkind: ConfigMap\nmetadata:\n    name: settings\n"
+               "    labels:\n        app: web  # the app\n    # end of metadata\ndata:\n    key: value\n")
+    tagged = _retag(content)
+
+    assert f"        app: web  # the app\n        iac_tagger: {TAG}\n    # end of metadata\n" in tagged
+    assert _labels(tagged)[0] == {"app": "web", "iac_tagger": TAG}
+
+
+def test_crlf_and_bom_are_kept():
+    content = "\ufeff" + _configmap("  name: settings\n  labels:\n    app: web\n").replace("\n", "\r\n")
+    tagged = _retag(content)
+
+    assert tagged.startswith("\ufeff")
+    assert "\n" not in tagged.replace("\r\n", "")
+    assert _labels(tagged.replace("\r\n", "\n"))[0]["iac_tagger"] == TAG
+
+
+def test_crlf_and_bom_files_round_trip(repo):
+    content = _configmap("  name: settings\n  labels:\n    app: web\n").replace("\n", "\r\n")
+    file_path = repo / "settings.yaml"
+    file_path.write_bytes(b"\xef\xbb\xbf" + content.encode())
+    commit_all(repo, "add settings.yaml")
+    tagger = IaCTagger()
+    try:
+        assert tagger.process_file(str(file_path)) is True
+        tagged = file_path.read_bytes()
+        assert tagged.startswith(b"\xef\xbb\xbf" + content.encode()[:content.index("data:")])
+        assert b"\n" not in tagged.replace(b"\r\n", b"")
+        assert tagger.process_file(str(file_path)) is False
+    finally:
+        tagger.close()
+
+
+def test_every_document_of_a_file_is_tagged():
+    first = _configmap("  name: settings\n  labels:\n    app: web\n")
+    second = first.replace("name: settings", "name: other")
+    tagged = _retag("---\n" + first + "---\n# comment only\n---\n" + second.replace("labels:\n    app: web\n", ""))
+
+    assert [labels["iac_tagger"] for labels in _labels(tagged)] == [TAG, TAG]
+    assert tagged.count("---\n") == 3
+
+
+@pytest.mark.parametrize("backend", ["libyaml", "ruamel"])
+def test_backends_splice_like_pure(backend):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if get_yaml_backend(backend).name != backend:
+            pytest.skip(f"{backend} is not installed")
+    contents = [
+        _configmap("  name: settings\n  labels:\n    app: web  # the app\n"),
+        _configmap("  name: settings\n  labels: {app: web}\n"),
+        "\ufeff" + _configmap("  name: settings\n  labels:\n").replace("\n", "\r\n"),
+    ]
+    for content in contents:
+        assert _retag(content, backend) == _retag(content, "pure")
@@ -0,0 +1,67 @@
+import asyncio
+import shutil
+
+import pytest
+
+from conftest import commit_all
+from iac_tagger.main import IaCTagger
+
+DEPLOYMENT = '''apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {name}
+spec:
+  replicas: 1
+'''
+
+
+@pytest.fixture
+def project(repo):
+    """A repository with a mix of Terraform files, manifests and a broken file"""
+    for number in range(12):
+        module = repo / f"module{number % 3}"
+        module.mkdir(exist_ok=True)
+        (module / f"main{number}.tf").write_text(
+            f'resource "aws_instance" "web{number}" {{\n  ami = "ami-{number}"\n}}\n')
+        (module / f"deploy{number}.yaml").write_text(DEPLOYMENT.format(name=f"web{number}"))
+    (repo / "broken.tf").write_text('resource "aws_instance" {\n')
+    commit_all(repo, "add project")
+    return repo
+
+
+def _run(root, jobs=1, concurrency=None):
+    tagger = IaCTagger()
+    try:
+        if concurrency:
+            results = asyncio.run(tagger.process_directory_async(str(root), True, concurrency=concurrency))
+        else:
+            results = tagger.process_directory(str(root), recursive=True, jobs=jobs)
+    finally:
+        tagger.close()
+    results = [(str(path)[len(str(root)):], result) for path, result in results.items()]
+    contents = {path.relative_to(root).as_posix(): path.read_bytes()
+                for path in sorted(root.rglob("*")) if path.is_file() and ".git" not in path.parts}
+    return results, contents
+
+
+def test_worker_pool_matches_a_serial_run(project, tmp_path):
+    parallel = tmp_path / "parallel"
+    shutil.copytree(project, parallel)
+
+    serial_results, serial_contents = _run(project, jobs=1)
+    parallel_results, parallel_contents = _run(parallel, jobs=2)
+
+    assert parallel_results == serial_results
+    assert parallel_contents == serial_contents
+    assert sum(result is True for _, result in serial_results) == 24
+    assert [path for path, result in serial_results if str(result).startswith("Error")] == ["/broken.tf"]
+    # Tagged again, nothing changes either way
+    assert all(result is False for _, result in _run(parallel, jobs=2)[0] if not str(result).startswith("Error"))
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_asyncio_pipeline_matches_a_serial_run(project, tmp_path, concurrency):
+    pipelined = tmp_path / "pipelined"
+    shutil.copytree(project, pipelined)
+
+    assert _run(pipelined, concurrency=concurrency) == _run(project)
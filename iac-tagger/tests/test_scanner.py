@@ -0,0 +1,75 @@
+from conftest import git
+from iac_tagger.main import IaCTagger
+from iac_tagger.scanner import filter_ignored, scan_files
+
+SUFFIXES = (".tf", ".yaml", ".yml")
+
+IGNORE_FILES = {
+    ".gitignore": "*.tfstate.tf\n/generated/\nbuild\n!keep.tf\n**/tmp/**\n",
+    "modules/.gitignore": "*.yml\n!important.yml\nlocal/\n/only-here.tf\n",
+    "modules/vpc/.gitignore": "[a-c].tf\n\\#literal.tf\n",
+    "envs/.gitignore": "*\n!*/\n!*.tf\n",
+}
+
+FILES = [
+    "main.tf", "keep.tf", "state.tfstate.tf", "deploy.yaml",
+    "generated/main.tf", "build/main.tf", "sub/build/main.tf", "sub/builds/main.tf",
+    "tmp/main.tf", "deep/tmp/nested/x.tf", "deep/tmpfile.tf",
+    "modules/a.yml", "modules/important.yml", "modules/main.tf", "modules/only-here.tf",
+    "modules/local/main.tf", "modules/sub/only-here.tf", "modules/sub/local/x.tf",
+    "modules/vpc/a.tf", "modules/vpc/d.tf", "modules/vpc/#literal.tf", "modules/vpc/b.yaml",
+    "envs/prod/main.tf", "envs/prod/values.yaml", "envs/dev.tf",
+    "notes.txt",
+]
+
+
+def _tree(repo):
+    for rel_path, content in IGNORE_FILES.items():
+        (repo / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / rel_path).write_text(content)
+    for rel_path in FILES:
+        path = repo / rel_path
+        if path.exists():
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+
+
+def _git_listing(repo, *paths):
+    # Global excludes of whoever runs the tests would skew git's view
+    listing = git(repo, "-c", "core.excludesFile=", "ls-files", "-co", "--exclude-standard", *paths)
+    return sorted(path for path in listing.splitlines() if path.endswith(SUFFIXES))
+
+
+def _relative(repo, paths):
+    return sorted(path.relative_to(repo).as_posix() for path in paths)
+
+
+def test_scan_matches_git_on_nested_ignore_files(repo):
+    _tree(repo)
+
+    assert _relative(repo, scan_files(str(repo), SUFFIXES)) == _git_listing(repo)
+    assert _relative(repo, IaCTagger().iter_files(str(repo), recursive=True)) == _git_listing(repo)
+
+
+def test_scan_of_a_subdirectory_applies_the_ignore_files_above_it(repo):
+    _tree(repo)
+
+    assert _relative(repo, scan_files(str(repo / "modules"), SUFFIXES)) == _git_listing(repo, "modules")
+
+
+def test_filter_ignored_agrees_with_the_scan(repo):
+    _tree(repo)
+    every_file = [repo / rel_path for rel_path in FILES if rel_path.endswith(SUFFIXES)]
+
+    assert _relative(repo, filter_ignored(str(repo), every_file)) == _git_listing(repo)
+
+
+def test_scan_yields_files_in_name_order_before_subdirectories(repo):
+    for rel_path in ["b.tf", "a/z.tf", "a.tf", "c/x.yaml"]:
+        (repo / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / rel_path).write_text("")
+
+    assert [path.relative_to(repo).as_posix() for path in scan_files(str(repo), SUFFIXES)] == \
+        ["a.tf", "b.tf", "a/z.tf", "c/x.yaml"]
+    assert [path.name for path in scan_files(str(repo), SUFFIXES, recursive=False)] == ["a.tf", "b.tf"]
@@ -0,0 +1,43 @@
+from conftest import commit_all
+from iac_tagger.main import IaCTagger
+
+RESOURCE = '''resource "aws_instance" "web_{0}" {{
+  ami = "ami-{0}"
+}}
+'''
+
+
+def _plan(repo, count):
+    tagger = IaCTagger()
+    try:
+        return tagger.plan_shards(str(repo), count, recursive=True)
+    finally:
+        tagger.close()
+
+
+def test_plan_does_not_change_once_a_shard_is_tagged(repo):
+    for index in range(8):
+        (repo / f"file_{index}.tf").write_text(RESOURCE.format(index) * (index + 1))
+    commit_all(repo, "add resources")
+    before = _plan(repo, 3)
+
+    tagger = IaCTagger()
+    try:
+        for file_path in before.files(1):
+            assert tagger.process_file(str(file_path)) is True
+    finally:
+        tagger.close()
+    # CRLF checkouts make the same change to sizes on disk
+    (repo / "file_7.tf").write_bytes((repo / "file_7.tf").read_bytes().replace(b"\n", b"\r\n"))
+    after = _plan(repo, 3)
+
+    assert after.shards == before.shards
+    assert after.fingerprint == before.fingerprint
+
+
+def test_untracked_files_are_spread_by_count(tmp_path):
+    for index in range(6):
+        (tmp_path / f"file_{index}.tf").write_text(RESOURCE.format(index))
+    plan = _plan(tmp_path, 3)
+
+    assert sorted(len(files) for files in plan.shards.values()) == [2, 2, 2]
@@ -0,0 +1,28 @@
+import json
+import sys
+
+import pytest
+
+from conftest import commit_all
+from iac_tagger.main import main
+
+RESOURCE = '''resource "aws_instance" "web" {
+  ami = "ami-123"
+}
+'''
+
+
+def test_missing_state_commit_falls_back_to_a_full_run(repo, tmp_path, monkeypatch):
+    (repo / "main.tf").write_text(RESOURCE)
+    head = commit_all(repo, "add main.tf")
+    state_file = tmp_path / "state.json"
+    # e.g. the HEAD of a run in a deeper clone, or before a force-push
+    state_file.write_text(json.dumps({"head": "1" * 40}))
+    monkeypatch.setattr(sys, "argv", ["iac-tagger", "-d", str(repo), "--state-file", str(state_file),
+                                      "--no-cache"])
+
+    with pytest.warns(UserWarning, match="not in the repository"):
+        main()
+
+    assert "iac_tagger" in (repo / "main.tf").read_text()
+    assert json.loads(state_file.read_text()) == {"head": head}
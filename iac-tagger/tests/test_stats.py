@@ -0,0 +1,74 @@
+import json
+import sys
+import threading
+
+import pytest
+
+from conftest import commit_all
+from iac_tagger.main import main
+from iac_tagger.stats import RunStats, format_prometheus, run_stats
+
+
+def test_threads_record_without_losing_figures():
+    stats = RunStats(slowest=5)
+    stats.enable()
+
+    def record(thread):
+        for number in range(2000):
+            with stats.phase("parse"):
+                pass
+            stats.count("cache_hits")
+            stats.add_bytes("read", 3)
+            stats.add_file(f"{thread}/{number}.tf", thread * 10000 + number)
+
+    threads = [threading.Thread(target=record, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = stats.snapshot()
+    assert snapshot["phases"]["parse"]["calls"] == 16000
+    assert snapshot["phases"]["read"]["bytes"] == 48000
+    assert snapshot["counters"] == {"cache_hits": 16000, "files": 16000}
+    assert [item["path"] for item in snapshot["slowest_files"]] == [f"7/{number}.tf" for number in range(1999, 1994, -1)]
+
+
+def test_merge_folds_in_worker_figures():
+    parent, worker = RunStats(slowest=2), RunStats(slowest=2)
+    parent.enable()
+    worker.enable()
+    parent.add_file("a.tf", 1.0)
+    worker.count("subprocesses", 3)
+    worker.add_file("b.tf", 3.0)
+    worker.add_file("c.tf", 2.0)
+
+    parent.merge(worker.drain())
+
+    snapshot = parent.snapshot()
+    assert snapshot["counters"] == {"files": 3, "subprocesses": 3}
+    assert [item["path"] for item in snapshot["slowest_files"]] == ["b.tf", "c.tf"]
+    assert worker.snapshot()["counters"] == {}
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_stats_of_a_run_include_worker_figures(repo, tmp_path, monkeypatch, jobs):
+    for number in range(4):
+        (repo / f"main{number}.tf").write_text(f'resource "aws_instance" "web{number}" {{\n  ami = "ami-1"\n}}\n')
+    commit_all(repo, "add files")
+    stats_file = tmp_path / "stats.json"
+    # The CLI records into the process-wide recorder; leave it as found
+    monkeypatch.setattr(run_stats, "enabled", False)
+    run_stats.reset()
+    monkeypatch.setattr(sys, "argv", ["iac-tagger", "-d", str(repo), "-j", jobs, "--no-cache",
+                                      "--stats", "json", "--stats-file", str(stats_file)])
+    try:
+        main()
+    finally:
+        run_stats.reset()
+
+    snapshot = json.loads(stats_file.read_text())
+    assert snapshot["counters"]["files"] == 4
+    assert snapshot["phases"]["write"]["calls"] == 4
+    assert sorted(item["path"] for item in snapshot["slowest_files"]) == [str(repo / f"main{n}.tf") for n in range(4)]
+    assert 'iac_tagger_phase_calls{phase="write"} 4' in format_prometheus(snapshot)
@@ -0,0 +1,44 @@
+import pytest
+import yaml
+
+from conftest import commit_all
+from iac_tagger.main import IaCTagger
+from iac_tagger.stats import run_stats
+
+RESOURCES = "\n".join(f'resource "aws_instance" "web{number}" {{\n  ami = "ami-{number}"\n}}\n' for number in range(5))
+
+MANIFESTS = "---\n".join(f"apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: config{number}\n"
+                         for number in range(3))
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    """The process-wide recorder, enabled and emptied for one test"""
+    monkeypatch.setattr(run_stats, "enabled", True)
+    run_stats.reset()
+    yield run_stats
+    run_stats.reset()
+
+
+@pytest.mark.parametrize("name, content, parse_phase, parses, count", [
+    ("main.tf", RESOURCES, "parse.hcl", 1, 5),
+    # Manifests are read one document at a time, plus the check for the end of the stream
+    ("manifests.yaml", MANIFESTS, "parse.yaml", 4, 3),
+])
+def test_all_resources_of_a_file_are_tagged_in_one_parse_and_write(repo, stats, name, content, parse_phase, parses,
+                                                                   count):
+    (repo / name).write_text(content)
+    commit_all(repo, f"add {name}")
+    tagger = IaCTagger()
+    try:
+        assert tagger.process_file(str(repo / name)) is True
+        phases = stats.snapshot()["phases"]
+        assert (phases["read"]["calls"], phases[parse_phase]["calls"], phases["write"]["calls"]) == (1, parses, 1)
+        assert set(tagger.check_file(str(repo / name)).values()) == {"current"}
+        assert len(tagger.check_file(str(repo / name))) == count
+    finally:
+        tagger.close()
+
+    if name.endswith(".yaml"):
+        assert len([doc for doc in yaml.safe_load_all((repo / name).read_text())
+                    if "iac_tagger" in doc["metadata"]["labels"]]) == count
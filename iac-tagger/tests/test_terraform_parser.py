@@ -0,0 +1,69 @@
+import hcl2
+import pytest
+
+from conftest import commit_all
+from iac_tagger.main import IaCTagger
+
+RESOURCE = '''resource "aws_vpc" "main" {{
+  cidr_block = "10.0.0.0/16"
+  tags = {tags}
+}}
+'''
+
+
+@pytest.fixture
+def tagger():
+    tagger = IaCTagger()
+    yield tagger
+    tagger.close()
+
+
+def _tag(repo, tagger, content, name="main.tf"):
+    file_path = repo / name
+    file_path.write_bytes(content.encode())
+    commit_all(repo, f"add {name}")
+    tagger.process_file(str(file_path))
+    return file_path
+
+
+@pytest.mark.parametrize("tags", [
+    '{ for k, v in var.extra : k => v }',
+    'merge(var.tags, { for k, v in var.extra : k => v })',
+    'var.on ? { A = "1" } : {}',
+])
+def test_computed_tags_are_left_alone_as_untaggable(repo, tagger, tags):
+    content = RESOURCE.format(tags=tags)
+    file_path = _tag(repo, tagger, content)
+
+    assert file_path.read_text() == content
+    assert tagger.check_file(str(file_path)) == {"aws_vpc.main": "untaggable"}
+
+
+def test_tag_goes_into_the_outer_map_of_nested_tags(repo, tagger):
+    file_path = _tag(repo, tagger, RESOURCE.format(tags='{\n    Extra = { a = "b" }\n  }'))
+    tagged = file_path.read_text()
+
+    tags = hcl2.loads(tagged)["resource"][0]["aws_vpc"]["main"]["tags"]
+    assert tags["Extra"] == {"a": "b"}
+    assert tags["iac_tagger"].startswith("aws_vpc.main:")
+    assert tagger.check_file(str(file_path)) == {"aws_vpc.main": "current"}
+    assert tagger.process_file(str(file_path)) is False
+
+
+def test_tag_goes_into_the_literal_argument_of_merge(repo, tagger):
+    file_path = _tag(repo, tagger, RESOURCE.format(tags='merge(var.on ? { A = "1" } : {}, { B = "2" })'))
+
+    assert '{ B = "2", iac_tagger = "aws_vpc.main:' in file_path.read_text()
+    assert tagger.check_file(str(file_path)) == {"aws_vpc.main": "current"}
+
+
+def test_crlf_files_round_trip(repo, tagger):
+    content = RESOURCE.format(tags='{\n    Name = "main"\n  }').replace("\n", "\r\n")
+    untagged = 'resource "aws_subnet" "a" {\r\n  vpc_id = aws_vpc.main.id\r\n}\r\n'
+    file_path = _tag(repo, tagger, content + "\r\n" + untagged)
+    tagged = file_path.read_bytes()
+
+    assert b"\n" not in tagged.replace(b"\r\n", b"")
+    assert tagged.startswith(content.split("  }")[0].encode())
+    assert tagger.check_file(str(file_path)) == {"aws_vpc.main": "current", "aws_subnet.a": "current"}
+    assert tagger.process_file(str(file_path)) is False
@@ -0,0 +1,81 @@
+import os
+
+from conftest import commit_all, git
+from iac_tagger.main import IaCTagger
+from iac_tagger.writeback import WriteBack, replace_file
+
+RESOURCE = '''resource "aws_instance" "web" {
+  ami = "ami-123"
+
+  tags = {
+    Name = "web"
+  }
+}
+'''
+
+
+def test_replace_file_keeps_content_and_mode(tmp_path):
+    target = tmp_path / "main.tf"
+    target.write_text("old\r\n")
+    os.chmod(target, 0o640)
+    assert replace_file(target, "new\r\n") == 5
+    assert target.read_bytes() == b"new\r\n"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert [path.name for path in tmp_path.iterdir()] == ["main.tf"]
+
+
+def test_replace_file_writes_through_symlinks(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    (shared / "main.tf").write_text("old\n")
+    stack = tmp_path / "stack"
+    stack.mkdir()
+    (stack / "main.tf").symlink_to("../shared/main.tf")
+
+    replace_file(stack / "main.tf", "new\n")
+    assert (stack / "main.tf").is_symlink()
+    assert (shared / "main.tf").read_text() == "new\n"
+    assert sorted(path.name for path in stack.iterdir()) == ["main.tf"]
+
+
+def test_writeback_defers_directory_syncs(tmp_path):
+    writeback = WriteBack()
+    for name in ("a.tf", "b.tf"):
+        (tmp_path / name).write_text("old\n")
+        replace_file(tmp_path / name, "new\n", sync_directory=False)
+        writeback.add(tmp_path / name)
+    assert writeback._pending == {str(tmp_path.resolve())}
+    writeback.flush()
+    assert writeback._pending == set()
+
+
+def test_tagging_a_symlinked_file_tags_its_target(repo):
+    (repo / "modules").mkdir()
+    (repo / "modules" / "main.tf").write_text(RESOURCE)
+    (repo / "stack").mkdir()
+    (repo / "stack" / "main.tf").symlink_to("../modules/main.tf")
+    commit_all(repo, "add stack")
+
+    tagger = IaCTagger()
+    try:
+        assert tagger.process_file(str(repo / "stack" / "main.tf"))
+        assert not tagger.process_file(str(repo / "stack" / "main.tf"))
+    finally:
+        tagger.close()
+    assert (repo / "stack" / "main.tf").is_symlink()
+    assert "iac_tagger" in (repo / "modules" / "main.tf").read_text()
+    # Only the target's content changed, not the link's type
+    assert git(repo, "status", "--porcelain") == "M modules/main.tf"
+
+
+def test_unchanged_files_keep_their_mtime(repo):
+    (repo / "main.tf").write_text(RESOURCE)
+    commit_all(repo, "add main.tf")
+    tagger = IaCTagger()
+    try:
+        tagger.process_file(str(repo / "main.tf"))
+        os.utime(repo / "main.tf", ns=(1_000_000_000, 1_000_000_000))
+        assert not tagger.process_file(str(repo / "main.tf"))
+    finally:
+        tagger.close()
+    assert (repo / "main.tf").stat().st_mtime_ns == 1_000_000_000
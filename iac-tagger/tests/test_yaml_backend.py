@@ -0,0 +1,39 @@
+import pytest
+
+from iac_tagger.cache import ResourceCache
+from iac_tagger.kubernetes_parser import KubernetesParser
+from iac_tagger.yaml_backend import get_yaml_backend
+
+# Scalars that YAML 1.1 and 1.2 resolve differently
+MANIFEST = '''apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: settings
+data:
+  enabled: yes
+  mode: 0644
+  debug: on
+  ratio: 1e3
+'''
+
+
+def _index(backend: str) -> dict:
+    return KubernetesParser(yaml_backend=backend).index_content(MANIFEST)
+
+
+def test_auto_picks_a_yaml_1_1_backend():
+    assert get_yaml_backend("auto").name in ("libyaml", "pure")
+
+
+def test_backends_picked_by_auto_hash_alike():
+    libyaml = get_yaml_backend("libyaml")
+    if libyaml.name != "libyaml":
+        pytest.skip("libyaml is not available")
+    assert _index("libyaml") == _index("pure")
+
+
+def test_cache_keys_depend_on_the_backend(tmp_path):
+    cache = ResourceCache(str(tmp_path))
+    keys = {cache.key(KubernetesParser(yaml_backend=backend).cache_namespace(), MANIFEST)
+            for backend in ("pure", "libyaml")}
+    assert len(keys) == (2 if get_yaml_backend("libyaml").name == "libyaml" else 1)